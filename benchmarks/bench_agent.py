@@ -0,0 +1,82 @@
+"""Benchmark the setup overhead of the AI agents on every request.
+
+Usage: python benchmarks/bench_agent.py [ROUNDS]
+"""
+
+import asyncio
+import sys
+import time
+from typing import Callable
+
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from voc_builder.builder.ai_svc import WordChoiceModelResp
+from voc_builder.infras.ai import get_agent
+
+DEFAULT_ROUNDS = 2_000
+SYSTEM_PROMPT = "You are a language assistant for English learners."
+
+
+def measure(name: str, rounds: int, func: Callable[[], object]):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    cost = time.perf_counter() - start
+    print(f"{name:<36} {cost / rounds * 1e6:10.1f}µs/request")
+
+
+def main(rounds: int):
+    model = TestModel()
+    measure(
+        "new Agent(str)",
+        rounds,
+        lambda: Agent(model, system_prompt=SYSTEM_PROMPT),
+    )
+    measure(
+        "get_agent(str)",
+        rounds,
+        lambda: get_agent(model, SYSTEM_PROMPT),
+    )
+    measure(
+        "new Agent(WordChoiceModelResp)",
+        rounds,
+        lambda: Agent(
+            model,
+            system_prompt=SYSTEM_PROMPT,
+            output_type=WordChoiceModelResp,  # type: ignore
+        ),
+    )
+    measure(
+        "get_agent(WordChoiceModelResp)",
+        rounds,
+        lambda: get_agent(model, SYSTEM_PROMPT, WordChoiceModelResp),
+    )
+
+    # The full requests, the test model replies without any network calls
+    async def run_new_agent():
+        agent: Agent = Agent(
+            model,
+            system_prompt=SYSTEM_PROMPT,
+            output_type=WordChoiceModelResp,  # type: ignore
+        )
+        await agent.run("Word: synergy")
+
+    async def run_cached_agent():
+        agent = get_agent(model, SYSTEM_PROMPT, WordChoiceModelResp)
+        await agent.run("Word: synergy")
+
+    loop = asyncio.new_event_loop()
+    measure(
+        "run with new agent", rounds, lambda: loop.run_until_complete(run_new_agent())
+    )
+    measure(
+        "run with cached agent",
+        rounds,
+        lambda: loop.run_until_complete(run_cached_agent()),
+    )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROUNDS)
@@ -0,0 +1,85 @@
+"""Benchmark the cost of turning the word documents into objects.
+
+Usage: python benchmarks/bench_converter.py [SIZE ...]
+"""
+
+import gc
+import json
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import cattrs
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras.converter import converter
+from voc_builder.infras.store import WordDetailedObj, WordStore
+
+DEFAULT_SIZES = [10_000, 100_000]
+
+
+def make_docs(size: int) -> List[Dict]:
+    docs = []
+    for i in range(size):
+        ws = WordSample(
+            word=f"word{i}",
+            word_normal=f"word{i}",
+            pronunciation="/wɜːd/",
+            definitions=["[noun] a unit of language", "[verb] express in words"],
+            orig_text="A word is a basic element of language that carries meaning.",
+            translated_text="单词是语言中承载意义的基本元素。",
+        )
+        wp = WordProgress(word=ws.word, quiz_cnt=i % 3, ts_date_quiz=1700000000.0)
+        docs.append({"ws": asdict(ws), "wp": asdict(wp), "ts_date_added": 1.0 * i})
+    return docs
+
+
+def measure(name: str, size: int, func: Callable[[], object]):
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    cost = time.perf_counter() - start
+    print(f"{name:<28} {size:>8} words  {cost:8.3f}s  {cost / size * 1e6:8.2f}µs/word")
+
+
+def main(sizes: List[int]):
+    for size in sizes:
+        docs = make_docs(size)
+        measure(
+            "cattrs global converter",
+            size,
+            lambda: [cattrs.structure(d, WordDetailedObj) for d in docs],  # noqa: B023
+        )
+        measure(
+            "dedicated converter",
+            size,
+            lambda: [converter.structure(d, WordDetailedObj) for d in docs],  # noqa: B023
+        )
+
+        objs = [converter.structure(d, WordDetailedObj) for d in docs]
+        measure(
+            "cattrs.unstructure(ws)",
+            size,
+            lambda: [cattrs.unstructure(obj.ws) for obj in objs],  # noqa: B023
+        )
+        measure(
+            "converter.unstructure(ws)",
+            size,
+            lambda: [converter.unstructure(obj.ws) for obj in objs],  # noqa: B023
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / "words.json"
+            data = {str(i + 1): d for i, d in enumerate(docs)}
+            file_path.write_text(json.dumps({"_default": data}))
+            store = WordStore(file_path)
+            store.count()
+            measure("WordStore.all()", size, lambda: list(store.all()))  # noqa: B023
+        print()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
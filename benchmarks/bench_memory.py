@@ -0,0 +1,73 @@
+"""Benchmark the memory used for keeping a vocabulary book resident.
+
+Usage: python benchmarks/bench_memory.py [SIZE]
+"""
+
+import json
+import sys
+import tempfile
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+from unittest import mock
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras import store
+from voc_builder.infras.store import WordStore
+
+DEFAULT_SIZE = 100_000
+# How many words are picked from the same sentence
+WORDS_PER_SENTENCE = 4
+
+
+def write_book(file_path: Path, size: int):
+    data = {}
+    for i in range(size):
+        sentence_id = i // WORDS_PER_SENTENCE
+        ws = WordSample(
+            word=f"word{i}",
+            word_normal=f"word{i}",
+            pronunciation="/wɜːd/",
+            definitions=["[noun] a unit of language", "[verb] express in words"],
+            orig_text=f"Sentence {sentence_id}: a word is a basic element of "
+            "language that carries meaning, it can be used on its own.",
+            translated_text=f"句子 {sentence_id}：单词是语言中承载意义的基本元素，"
+            "可以单独使用。",
+        )
+        wp = WordProgress(word=ws.word)
+        data[str(i + 1)] = {"ws": asdict(ws), "wp": asdict(wp), "ts_date_added": i}
+    file_path.write_text(json.dumps({"_default": data}))
+
+
+def measure(name: str, file_path: Path, size: int):
+    tracemalloc.start()
+    word_store = WordStore(file_path)
+    word_store.count()
+    resident, _ = tracemalloc.get_traced_memory()
+    objs = list(word_store.all())
+    loaded, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(objs) == size
+    print(f"{name}:")
+    for label, value in [
+        ("resident store", resident),
+        ("with all objects loaded", loaded),
+        ("peak", peak),
+    ]:
+        print(f"  {label:<24} {value / 1024**2:8.1f}MB  {value / size:8.0f}B/word")
+
+
+def main(size: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir) / "words.json"
+        write_book(file_path, size)
+        # Upgrade the file to the latest schema first
+        WordStore(file_path)
+        with mock.patch.object(store, "compact_word_doc", return_value=None):
+            measure("Not compacted", file_path, size)
+        measure("Compacted", file_path, size)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE)
@@ -0,0 +1,114 @@
+"""Benchmark the events and bytes sent by the story SSE stream.
+
+A 24-word story is streamed token by token at a simulated speed, the streams in the
+full and delta modes are measured with and without coalescing.
+
+Usage: python benchmarks/bench_sse.py [TOKENS_PER_SECOND]
+"""
+
+import asyncio
+import sys
+import time
+from typing import List
+from unittest import mock
+
+from sse_starlette.sse import ServerSentEvent
+
+from voc_builder.builder.models import WordSample
+from voc_builder.common.web.sse import StreamMode
+from voc_builder.infras import config
+from voc_builder.learn.views import gen_story_sse
+
+WORDS_NUM = 24
+# The chars of a token
+TOKEN_SIZE = 4
+DEFAULT_TOKENS_PER_SECOND = 50
+
+
+def make_story(words: List[WordSample]) -> str:
+    """Make a story about 25 words per special word, like the replies of the AI."""
+    paragraphs = []
+    for i in range(0, len(words), 4):
+        sentences = [
+            f"The little fox found a ${w.word}$ near the river, and it was happy to "
+            "show the new friend to everyone in the forest."
+            for w in words[i : i + 4]
+        ]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+class VirtualClock:
+    """A clock which advances only when a token is generated."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def measure(
+    name: str,
+    mode: StreamMode,
+    words: List[WordSample],
+    story: str,
+    tokens_per_second: int,
+    coalesced: bool,
+) -> int:
+    clock = VirtualClock()
+
+    async def fake_get_story(model, words, delta=False):
+        for i in range(TOKEN_SIZE, len(story) + TOKEN_SIZE, TOKEN_SIZE):
+            clock.now += 1 / tokens_per_second
+            yield story[i - TOKEN_SIZE : i] if delta else story[:i]
+
+    async def run() -> List[bytes]:
+        return [
+            ServerSentEvent(**event).encode()
+            async for event in gen_story_sse(words, mode)
+        ]
+
+    with (
+        mock.patch("voc_builder.learn.views.create_ai_model_config"),
+        mock.patch("voc_builder.learn.views.get_story", fake_get_story),
+        mock.patch("voc_builder.common.web.sse.time", clock),
+        mock.patch.multiple(
+            config,
+            SSE_FLUSH_INTERVAL=config.SSE_FLUSH_INTERVAL if coalesced else 0,
+            SSE_MIN_CHUNK_SIZE=config.SSE_MIN_CHUNK_SIZE if coalesced else 0,
+        ),
+    ):
+        start = time.perf_counter()
+        payloads = asyncio.run(run())
+        cost = time.perf_counter() - start
+
+    total = sum(len(p) for p in payloads)
+    print(
+        f"{name:<16} {len(payloads):>5} events  {total / 1024:8.1f}KB  "
+        f"{cost * 1000:7.1f}ms"
+    )
+    return total
+
+
+def main(tokens_per_second: int):
+    words = [
+        WordSample(f"word{i}", f"word{i}", "", ["[noun] 单词"], "", "")
+        for i in range(WORDS_NUM)
+    ]
+    story = make_story(words)
+    print(f"Story: {len(story.split())} words, {len(story)} chars")
+    print(
+        f"Coalescing: interval={config.SSE_FLUSH_INTERVAL}s, "
+        f"min chunk size={config.SSE_MIN_CHUNK_SIZE}\n"
+    )
+    args = (words, story, tokens_per_second)
+    full = measure("full", StreamMode.FULL, *args, coalesced=False)
+    delta = measure("delta", StreamMode.DELTA, *args, coalesced=False)
+    measure("full coalesced", StreamMode.FULL, *args, coalesced=True)
+    measure("delta coalesced", StreamMode.DELTA, *args, coalesced=True)
+    print(f"\nSaved by delta mode: {(full - delta) / full:.1%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TOKENS_PER_SECOND)
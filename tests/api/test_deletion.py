@@ -0,0 +1,25 @@
+from voc_builder.builder.models import WordSample
+from voc_builder.infras.store import get_mastered_word_store, get_word_store
+
+
+def test_delete_word_samples(client):
+    word_store = get_word_store()
+    for word in ["python", "java", "rust"]:
+        word_store.add(WordSample(word, word, "", [], f"{word} is a language", ""))
+
+    resp = client.post(
+        "/api/word_samples/deletion/",
+        json={"words": ["python", "java", "missing"], "mark_mastered": True},
+    )
+    assert resp.status_code == 204
+    assert [obj.word for obj in word_store.all()] == ["rust"]
+    assert set(get_mastered_word_store().all()) == {"python", "java", "missing"}
+
+
+def test_delete_mastered_words(client):
+    mastered_word_s = get_mastered_word_store()
+    mastered_word_s.add_many(["python", "java", "python"])
+
+    resp = client.post("/api/mastered_words/deletion/", json={"words": ["python"]})
+    assert resp.status_code == 204
+    assert mastered_word_s.all() == ["java"]
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from typing import List, Tuple
+from unittest import mock
+
+import pytest
+from pydantic_ai.models.test import TestModel
+
+from voc_builder.builder.views import gen_translation_sse
+from voc_builder.common.web.sse import StreamMode
+from voc_builder.infras.ai import AIModelConfig, AIResultMode
+from voc_builder.learn.views import gen_story_sse
+
+# A text with line breaks, the test model streams it word by word
+TEXT = "Once upon a time, there was a little $fox$.\n\nIt lived in the forest."
+
+
+@pytest.fixture(autouse=True)
+def _mock_ai_model():
+    model_config = AIModelConfig(
+        TestModel(custom_output_text=TEXT), AIResultMode.PYDANTIC
+    )
+    with (
+        mock.patch(
+            "voc_builder.builder.views.create_ai_model_config", return_value=model_config
+        ),
+        mock.patch(
+            "voc_builder.learn.views.create_ai_model_config", return_value=model_config
+        ),
+    ):
+        yield
+
+
+async def collect(events_gen) -> List[Tuple[str, str]]:
+    return [(e["event"], e["data"]) async for e in events_gen]
+
+
+def get_checksum(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@pytest.mark.asyncio
+class TestTranslationSSE:
+    async def test_full_mode(self):
+        events = await collect(gen_translation_sse("Hello, world!"))
+
+        partials = [
+            json.loads(d)["translated_text"] for e, d in events if e == "trans_partial"
+        ]
+        assert partials[-1] == TEXT
+        assert events[-1][0] == "translation"
+        assert json.loads(events[-1][1])["translated_text"] == TEXT
+
+    async def test_delta_mode(self):
+        events = await collect(gen_translation_sse("Hello, world!", StreamMode.DELTA))
+
+        deltas = [json.loads(d)["delta"] for e, d in events if e == "trans_delta"]
+        assert "".join(deltas) == TEXT
+        assert not any(e == "trans_partial" for e, _ in events)
+
+        (checksum_event, checksum_data), (final_event, final_data) = events[-2:]
+        assert checksum_event == "checksum"
+        assert json.loads(checksum_data) == {
+            "algorithm": "sha256",
+            "value": get_checksum(TEXT),
+        }
+        assert final_event == "translation"
+        assert json.loads(final_data)["translated_text"] == TEXT
+
+
+@pytest.mark.asyncio
+class TestStorySSE:
+    async def test_full_mode(self, w_sample_world):
+        events = await collect(gen_story_sse([w_sample_world]))
+
+        assert [e for e, _ in events if e == "story_partial"]
+        assert events[-1] == ("story", TEXT)
+
+    async def test_delta_mode(self, w_sample_world):
+        events = await collect(gen_story_sse([w_sample_world], StreamMode.DELTA))
+
+        deltas = [d for e, d in events if e == "story_delta"]
+        assert "".join(deltas) == TEXT
+        assert [e for e, _ in events[-2:]] == ["checksum", "story"]
+        assert json.loads(events[-2][1])["value"] == get_checksum(TEXT)
+        assert events[-1][1] == TEXT
@@ -0,0 +1,11 @@
+from unittest import mock
+
+
+def test_system_status_version_check_error(client):
+    with mock.patch(
+        "voc_builder.system.views.get_new_version", side_effect=RuntimeError("boom")
+    ):
+        resp = client.get("/api/system_status")
+    assert resp.status_code == 200
+    assert resp.json()["new_version"] is None
+    assert resp.json()["words_cnt"] == 0
@@ -1,4 +1,5 @@
 from types import SimpleNamespace
+from typing import List
 from unittest import mock
 
 import pytest
@@ -8,7 +9,10 @@ from voc_builder.builder.ai_svc import (
     ManuallyWordQuerier,
     RareWordQuerier,
     WordChoiceModelResp,
+    get_translation,
+    get_word_def_cache,
 )
+from voc_builder.common.text import split_sentences
 from voc_builder.exceptions import AIServiceError
 from voc_builder.infras.ai import AIResultMode, PromptText
 
@@ -151,3 +155,125 @@ class TestJsonWordDefGetter:
             await JsonWordDefGetter().query(
                 None, PromptText([], []), "Simplified Chinese"
             )
+
+
+@pytest.mark.asyncio
+class TestWordDefCache:
+    @pytest.fixture()
+    def result_mode(self):
+        return AIResultMode.PYDANTIC
+
+    @mock.patch("voc_builder.builder.ai_svc.PydanticWordDefGetter.agent_request")
+    async def test_cached(self, mocker, word_querier_invoker):
+        _, _invoker = word_querier_invoker
+        mocker.return_value = SimpleNamespace(output=VALID_PYDANTIC_REPLY)
+
+        word = await _invoker()
+        assert await _invoker() == word
+        assert mocker.call_count == 1
+        assert get_word_def_cache().stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    @mock.patch("voc_builder.builder.ai_svc.PydanticWordDefGetter.agent_request")
+    async def test_different_language(self, mocker):
+        mocker.return_value = SimpleNamespace(output=VALID_PYDANTIC_REPLY)
+        querier = ManuallyWordQuerier(None, result_mode=AIResultMode.PYDANTIC)
+        text = "The team's synergy was evident in their performance."
+
+        await querier.query(text, "synergy", "Simplified Chinese")
+        await querier.query(text, "synergy", "Japanese")
+        assert mocker.call_count == 2
+
+
+async def fake_query_translation(model, text, language, delta=False):
+    """Translate the text by upper casing it, in two pieces."""
+    translated = text.upper()
+    half = len(translated) // 2
+    if delta:
+        yield translated[:half]
+        yield translated[half:]
+    else:
+        yield translated[:half]
+        yield translated
+
+
+@pytest.mark.asyncio
+@mock.patch(
+    "voc_builder.builder.ai_svc.query_translation", side_effect=fake_query_translation
+)
+class TestTranslationMemory:
+    async def translate(self, text: str, delta: bool = False) -> List[str]:
+        return [
+            t async for t in get_translation(None, text, "Simplified Chinese", delta)
+        ]
+
+    async def test_all_new(self, mocker):
+        texts = await self.translate("Hello world. Good day.")
+        assert texts[-1] == "HELLO WORLD. GOOD DAY."
+        assert mocker.call_count == 1
+
+    async def test_reuse_sentences(self, mocker):
+        await self.translate("Hello world. Good day.")
+
+        texts = await self.translate("Good day.  New one here.\nHello world.")
+        assert texts[-1] == "GOOD DAY.  NEW ONE HERE.\nHELLO WORLD."
+        # Only the new sentence is sent to the AI
+        assert mocker.call_args[0][1] == "New one here."
+
+        texts = await self.translate("Hello world. Good day.")
+        assert texts == ["HELLO WORLD.", "HELLO WORLD. GOOD DAY."]
+        assert mocker.call_count == 2
+
+    async def test_delta_mode(self, mocker):
+        await self.translate("Hello world. Good day.")
+
+        pieces = await self.translate("New one. Good day. Another one.", delta=True)
+        assert "".join(pieces) == "NEW ONE. GOOD DAY. ANOTHER ONE."
+        assert [c[0][1] for c in mocker.call_args_list[1:]] == [
+            "New one.",
+            "Another one.",
+        ]
+
+    async def test_unmatched_sentences(self, mocker):
+        mocker.side_effect = lambda model, text, language, delta: fake_query_translation(
+            model, text.replace(".", ""), language, delta
+        )
+        await self.translate("Hello world. Good day.")
+        await self.translate("Hello world. Good day.")
+        # The translation can't be split into the same number of sentences
+        assert mocker.call_count == 2
+
+    async def test_cjk_translation(self, mocker):
+        words = {
+            "Hello world.": "你好，世界。",
+            "Good day.": "日安。",
+            "New one.": "新的。",
+        }
+
+        async def _query(model, text, language, delta=False):
+            yield "".join(words[s] for s, _ in split_sentences(text))
+
+        mocker.side_effect = _query
+        await self.translate("Hello world. Good day.")
+
+        # Only the line breaks of the separators are kept
+        texts = await self.translate("New one. Good day.\n  Hello world.")
+        assert texts[-1] == "新的。日安。\n你好，世界。"
+        pieces = await self.translate("Good day. New one.", delta=True)
+        assert "".join(pieces) == "日安。新的。"
+
+
+@pytest.mark.asyncio
+@mock.patch("voc_builder.builder.ai_svc.PydanticWordDefGetter.agent_request")
+async def test_rare_word_single_candidate(mocker):
+    mocker.return_value = SimpleNamespace(output=VALID_PYDANTIC_REPLY)
+    word = await RareWordQuerier(None, result_mode=AIResultMode.PYDANTIC).query(
+        "The team's synergy was evident.",
+        {"team", "was", "evident"},
+        "Simplified Chinese",
+    )
+    assert word.word == "synergy"
+
+    # The word is queried directly, no need to choose from a list
+    prompt = mocker.call_args[0][1]
+    assert "Word: synergy" in prompt.user
+    assert "Word List" not in prompt.user
@@ -0,0 +1,49 @@
+import time
+from dataclasses import asdict
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.commands.db import handle_migrate
+from voc_builder.infras import config
+from voc_builder.infras.storages import open_db
+from voc_builder.infras.store import MasteredWordStore, WordStore
+from voc_builder.infras.store_sqlite import (
+    SQLITE_DB_FILENAME,
+    SQLiteMasteredWordStore,
+    SQLiteWordStore,
+)
+
+
+def test_handle_migrate(w_sample_world):
+    WordStore(config.DEFAULT_DB_PATH / "word.json").add(w_sample_world)
+    MasteredWordStore(config.DEFAULT_DB_PATH / "mastered_word.json").add("python")
+
+    handle_migrate("json")
+
+    db_path = config.DEFAULT_DB_PATH / SQLITE_DB_FILENAME
+    obj = SQLiteWordStore(db_path).get("world")
+    assert obj
+    assert obj.ws == w_sample_world
+    assert SQLiteMasteredWordStore(db_path).all() == ["python"]
+
+
+def test_handle_migrate_keeps_source():
+    # A word in the legacy schema, which is upgraded when the store is opened
+    open_db(config.DEFAULT_DB_PATH / "word.json").insert(
+        {
+            "ws": asdict(WordSample.make_empty("program")),
+            "wp": asdict(WordProgress(word="program", quiz_cnt=3)),
+            "ts_date_added": time.time(),
+        }
+    )
+    files = {p.name: p.read_bytes() for p in config.DEFAULT_DB_PATH.iterdir()}
+
+    handle_migrate("json")
+
+    obj = SQLiteWordStore(config.DEFAULT_DB_PATH / SQLITE_DB_FILENAME).get("program")
+    assert obj
+    assert obj.wp.quiz_cnt == 3
+    # No source file was modified or created
+    for p in config.DEFAULT_DB_PATH.iterdir():
+        if not p.name.startswith(SQLITE_DB_FILENAME):
+            assert files.pop(p.name) == p.read_bytes()
+    assert not files
@@ -0,0 +1,46 @@
+from typing import List
+
+import pytest
+
+from voc_builder.common.web.sse import coalesce_text
+
+PIECES = ["Once ", "upon ", "a ", "time, ", "there ", "was ", "a ", "fox."]
+
+
+async def iter_texts(delta: bool):
+    text = ""
+    for piece in PIECES:
+        text += piece
+        yield piece if delta else text
+
+
+async def collect(delta: bool, flush_interval: float, min_chunk_size: int) -> List[str]:
+    return [
+        t
+        async for t in coalesce_text(
+            iter_texts(delta), delta, flush_interval, min_chunk_size
+        )
+    ]
+
+
+@pytest.mark.asyncio
+class TestCoalesceText:
+    async def test_delta_by_chunk_size(self):
+        chunks = await collect(True, 0, 10)
+        assert chunks == ["Once upon ", "a time, there ", "was a fox."]
+
+    async def test_full_by_chunk_size(self):
+        texts = await collect(False, 0, 10)
+        assert texts == [
+            "Once upon ",
+            "Once upon a time, there ",
+            "Once upon a time, there was a fox.",
+        ]
+
+    async def test_by_interval(self):
+        # Only the first chunk and the final text are sent within the interval
+        assert await collect(True, 60, 1) == ["Once ", "upon a time, there was a fox."]
+        assert await collect(False, 60, 1) == ["Once ", "".join(PIECES)]
+
+    async def test_no_coalescing(self):
+        assert await collect(True, 0, 0) == PIECES
@@ -1,4 +1,8 @@
-from voc_builder.common.text import get_word_candidates, tokenize_text
+from unittest import mock
+
+import pytest
+
+from voc_builder.common.text import get_word_candidates, split_sentences, tokenize_text
 
 
 def test_tokenize_text():
@@ -22,3 +26,59 @@ def test_get_words_candidates():
         "official",
         "documentation",
     }
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        (
+            'Hello, world! Pi is 3.14 here. He said "go."  Then\n\nleft?',
+            [
+                ("Hello, world!", " "),
+                ("Pi is 3.14 here.", " "),
+                ('He said "go."', "  "),
+                ("Then\n\nleft?", ""),
+            ],
+        ),
+        (
+            "你好，世界！今天很好。他问",
+            [("你好，世界！", ""), ("今天很好。", ""), ("他问", "")],
+        ),
+        ("No end", [("No end", "")]),
+        ("", []),
+    ],
+)
+def test_split_sentences(text, expected):
+    assert split_sentences(text) == expected
+    assert "".join(s + sep for s, sep in expected) == text
+
+
+_FREQUENCIES = {
+    "was": 6.5,
+    "team": 5.2,
+    "synergy": 3.0,
+    "evident": 4.0,
+    "performance": 4.8,
+}
+
+
+@mock.patch(
+    "voc_builder.common.text.is_word_freq_available", mock.Mock(return_value=True)
+)
+@mock.patch("voc_builder.common.text.get_word_frequency", _FREQUENCIES.get)
+def test_get_words_candidates_limit():
+    s = "The team's synergy was evident in their performance during the season."
+    # "during" and "season" have no frequencies, they are the rarest
+    assert get_word_candidates(s, limit=3) == {"during", "season", "synergy"}
+    assert get_word_candidates(s, known_words={"during", "season"}, limit=2) == {
+        "synergy",
+        "evident",
+    }
+
+
+@mock.patch(
+    "voc_builder.common.text.is_word_freq_available", mock.Mock(return_value=False)
+)
+def test_get_words_candidates_limit_no_frequencies():
+    s = "The team's synergy was evident in their performance."
+    assert len(get_word_candidates(s, limit=1)) == 5
@@ -0,0 +1,44 @@
+import sys
+
+import pytest
+
+from voc_builder.common import word_freq
+from voc_builder.common.word_freq import get_word_frequency, is_word_freq_available
+
+
+@pytest.fixture()
+def _clear_frequency_func():
+    word_freq._get_frequency_func.cache_clear()
+    yield
+    word_freq._get_frequency_func.cache_clear()
+
+
+@pytest.mark.usefixtures("_clear_frequency_func")
+def test_wordfreq_not_installed(monkeypatch):
+    # Importing a module which is None in sys.modules raises ImportError
+    monkeypatch.setitem(sys.modules, "wordfreq", None)
+    assert is_word_freq_available() is False
+    assert get_word_frequency("house") is None
+
+
+@pytest.mark.parametrize(
+    ("common", "rare"),
+    [
+        ("house", "sculpture"),
+        ("use", "utilize"),
+        ("begin", "commence"),
+        ("happy", "happily"),
+        ("big", "gargantuan"),
+        ("water", "aquifer"),
+        ("home", "homely"),
+        ("city", "democracies"),
+    ],
+)
+def test_rare_words(common, rare):
+    pytest.importorskip("wordfreq")
+    assert get_word_frequency(common) > get_word_frequency(rare) > 0
+
+
+def test_unknown_word():
+    pytest.importorskip("wordfreq")
+    assert get_word_frequency("xqzzyv") == 0
@@ -2,6 +2,7 @@ import pytest
 
 from voc_builder.builder.models import WordSample
 from voc_builder.infras import config
+from voc_builder.infras.store import store_registry
 
 
 @pytest.fixture(autouse=True)
@@ -9,6 +10,8 @@ def setup_config(tmp_path):
     """Set up configs, change the path of databases and book so no one get hurt."""
     config.DEFAULT_DB_PATH = tmp_path
     config.DEFAULT_CSV_FILE_PATH = tmp_path / "foo.csv"
+    yield
+    store_registry.close_all()
 
 
 @pytest.fixture
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from voc_builder.builder.ai_svc import WordChoiceModelResp
+from voc_builder.infras import ai
+from voc_builder.infras.ai import (
+    close_http_client,
+    get_agent,
+    get_ai_model,
+    get_http_client,
+)
+from voc_builder.system.models import GeminiConfig, OpenAIConfig, SystemSettings
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    yield
+    asyncio.run(close_http_client())
+
+
+def _make_settings(api_key: str = "test_key") -> SystemSettings:
+    return SystemSettings(
+        model_provider="openai",
+        openai_config=OpenAIConfig(api_key=api_key, api_host="", model="gpt-4o"),
+        gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+    )
+
+
+class TestGetAIModel:
+    def test_reuse_model(self):
+        assert get_ai_model(_make_settings()) is get_ai_model(_make_settings())
+
+    def test_config_changed(self):
+        settings = _make_settings()
+        model = get_ai_model(settings)
+
+        settings.openai_config.api_key = "new_key"
+        assert get_ai_model(settings) is not model
+
+    def test_concurrent_calls(self):
+        def _create_slowly(settings):
+            time.sleep(0.01)
+            return object()
+
+        with (
+            mock.patch.object(ai, "create_ai_model", side_effect=_create_slowly),
+            ThreadPoolExecutor(max_workers=8) as executor,
+        ):
+            models = list(
+                executor.map(lambda _: get_ai_model(_make_settings()), range(16))
+            )
+        assert all(model is models[0] for model in models)
+
+    def test_close_http_client(self):
+        client = get_http_client()
+        model = get_ai_model(_make_settings())
+        asyncio.run(close_http_client())
+
+        assert client.is_closed
+        assert ai._cached_model is None
+        assert get_http_client() is not client
+        assert get_ai_model(_make_settings()) is not model
+
+
+class TestGetAgent:
+    def test_reuse_agent(self):
+        model = get_ai_model(_make_settings())
+        agent = get_agent(model, "foo", WordChoiceModelResp)
+        assert get_agent(model, "foo", WordChoiceModelResp) is agent
+        assert agent.output_type is WordChoiceModelResp
+
+    def test_different_keys(self):
+        model = get_ai_model(_make_settings())
+        agent = get_agent(model, "foo")
+        assert get_agent(model, "bar") is not agent
+        assert get_agent(model, "foo", WordChoiceModelResp) is not agent
+        assert get_agent(get_ai_model(_make_settings("new_key")), "foo") is not agent
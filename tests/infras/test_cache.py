@@ -0,0 +1,91 @@
+from unittest import mock
+
+from voc_builder.infras.cache import LRUCacheStore
+
+
+class TestLRUCacheStore:
+    def test_get_set(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl")
+        assert cache.get("foo") is None
+
+        cache.set("foo", {"bar": [1, 2]})
+        assert cache.get("foo") == {"bar": [1, 2]}
+        cache.set("foo", "baz")
+        assert cache.get("foo") == "baz"
+        assert cache.stats() == {"size": 1, "hits": 2, "misses": 1}
+
+    def test_evict_least_recently_used(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # "a" is used, so "b" becomes the least recently used one
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+        # The order is kept after loading from the file
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=2)
+        cache.set("d", 4)
+        assert cache.get("a") is None
+        assert cache.get("c") == 3
+
+    def test_modified_by_others(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl")
+        cache.set("a", 1)
+        assert cache.get("b") is None
+
+        other_cache = LRUCacheStore(tmp_path / "foo.jsonl")
+        other_cache.set("b", 2)
+        assert cache.get("b") == 2
+
+    def test_read_without_writing(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        content = (tmp_path / "foo.jsonl").read_text()
+        assert cache.get("a") == 1
+        assert (tmp_path / "foo.jsonl").read_text() == content
+
+        # The used time is saved together with the next write
+        cache.set("c", 3)
+        assert len((tmp_path / "foo.jsonl").read_text().splitlines()) == 6
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=2)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    def test_get_many(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        content = (tmp_path / "foo.jsonl").read_text()
+        assert cache.get_many(["a", "c", "b"]) == [1, None, 2]
+        assert (tmp_path / "foo.jsonl").read_text() == content
+        assert cache.stats() == {"size": 2, "hits": 2, "misses": 1}
+
+    def test_save_used_by_interval(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", save_used_interval=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        content = (tmp_path / "foo.jsonl").read_text()
+        with mock.patch("time.time", return_value=cache._ts_used_saved + 61):
+            assert cache.get("a") == 1
+        assert (tmp_path / "foo.jsonl").read_text() != content
+
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=1)
+        cache.set("c", 3)
+        assert cache.get("a") is None
+
+    def test_unsaved_used_kept_after_reload(self, tmp_path):
+        cache = LRUCacheStore(tmp_path / "foo.jsonl", max_size=3)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+
+        # The file is reloaded after others' writes, "a" is still more recent than "b"
+        LRUCacheStore(tmp_path / "foo.jsonl", max_size=3).set("c", 3)
+        cache.set("d", 4)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
@@ -0,0 +1,16 @@
+from dataclasses import asdict
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras.converter import converter
+from voc_builder.infras.store import WordDetailedObj
+
+
+def test_round_trip():
+    obj = WordDetailedObj(
+        ws=WordSample("program", None, "", ["[noun] 程序"], "", ""),
+        wp=WordProgress(word="program", quiz_cnt=1),
+        ts_date_added=1000.0,
+    )
+    data = converter.unstructure(obj)
+    assert data == {"ws": asdict(obj.ws), "wp": asdict(obj.wp), "ts_date_added": 1000.0}
+    assert converter.structure(data, WordDetailedObj) == obj
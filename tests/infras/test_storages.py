@@ -0,0 +1,226 @@
+import multiprocessing
+from unittest import mock
+
+import pytest
+from tinydb.storages import JSONStorage
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras.storages import (
+    JSONLogStorage,
+    batch_writes,
+    import_json_db,
+    open_db,
+)
+from voc_builder.infras.store import MasteredWordStore, WordStore
+
+
+class TestSharedTinyDB:
+    def test_insert_multiple(self, tmp_path):
+        db = open_db(tmp_path / "foo.json")
+        doc_ids = db.insert_multiple([{"word": "foo"}, {"word": "bar"}])
+        assert len(set(doc_ids)) == 2
+        assert len(db.all()) == 2
+
+    def test_inserted_by_others(self, tmp_path):
+        db = open_db(tmp_path / "foo.json")
+        db.insert({"word": "foo"})
+        other_db = open_db(tmp_path / "foo.json")
+        other_db.insert({"word": "bar"})
+
+        # The ID used by others should not be used again
+        db.insert({"word": "baz"})
+        assert len(db.all()) == 3
+
+
+class TestCachedJSONStorage:
+    def test_batch_writes(self, tmp_path):
+        db = open_db(tmp_path / "foo.json")
+        with mock.patch.object(
+            JSONStorage, "write", autospec=True, side_effect=JSONStorage.write
+        ) as write:
+            with batch_writes(db):
+                db.insert({"word": "foo"})
+                db.table("bar").insert({"word": "bar"})
+                assert len(db.all()) == 1
+            assert write.call_count == 1
+
+        new_db = open_db(tmp_path / "foo.json")
+        assert len(new_db.all()) == 1
+        assert len(new_db.table("bar")) == 1
+
+    def test_batch_writes_error(self, tmp_path):
+        db = open_db(tmp_path / "foo.json")
+        db.insert({"word": "foo"})
+
+        def _insert_and_fail():
+            with batch_writes(db):
+                db.insert({"word": "bar"})
+                raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            _insert_and_fail()
+
+        # The changes in the block are dropped
+        assert [d["word"] for d in db.all()] == ["foo"]
+
+
+class TestJSONLogStorage:
+    def test_word_store(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("python"))
+        word_store.update_progresses([WordProgress(word="python", quiz_cnt=1)])
+        word_store.remove("program")
+
+        new_store = WordStore(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert new_store.count() == 1
+        obj = new_store.get("python")
+        assert obj
+        assert obj.wp.quiz_cnt == 1
+
+    def test_append_only(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        for i in range(10):
+            word_store.add(WordSample.make_empty(f"word{i}"))
+        word_store.update_progresses([WordProgress(word="word0", quiz_cnt=1)])
+        word_store.remove("word1")
+
+        # One line for every change after the header, the progresses are in another file
+        lines = (tmp_path / "foo.jsonl").read_text().splitlines()
+        assert len(lines) == 12
+        lines = (tmp_path / "foo_jsonl_progress.jsonl").read_text().splitlines()
+        assert len(lines) == 2
+
+    def test_modified_by_others(self, tmp_path):
+        mastered_words_s = MasteredWordStore(
+            tmp_path / "foo.jsonl", storage=JSONLogStorage
+        )
+        mastered_words_s.add("program")
+
+        other_store = MasteredWordStore(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        other_store.add("python")
+        other_store.remove("program")
+        assert set(mastered_words_s.all()) == {"python"}
+
+        # Append lines after the others
+        mastered_words_s.add("java")
+        assert set(other_store.all()) == {"python", "java"}
+
+    def test_batch_writes(self, tmp_path):
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        doc_id = db.insert({"word": "foo"})
+        with mock.patch.object(
+            JSONLogStorage,
+            "_append_lines",
+            autospec=True,
+            side_effect=JSONLogStorage._append_lines,
+        ) as append_lines:
+            with batch_writes(db):
+                db.insert({"word": "bar"})
+                db.remove(doc_ids=[doc_id])
+            assert append_lines.call_count == 1
+
+        new_db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert [d["word"] for d in new_db.all()] == ["bar"]
+
+    def test_batch_writes_error(self, tmp_path):
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        db.insert({"word": "foo"})
+
+        def _insert_and_fail():
+            with batch_writes(db):
+                db.insert({"word": "bar"})
+                raise RuntimeError
+
+        with pytest.raises(RuntimeError):
+            _insert_and_fail()
+
+        # The changes in the block are dropped
+        assert [d["word"] for d in db.all()] == ["foo"]
+        assert len((tmp_path / "foo.jsonl").read_text().splitlines()) == 2
+
+    def test_compact(self, tmp_path):
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        doc_id = db.insert({"word": "foo", "cnt": 0})
+        for i in range(10):
+            db.update({"cnt": i + 1}, doc_ids=[doc_id])
+        db.insert({"word": "bar", "cnt": 0})
+
+        storage = db.storage
+        assert isinstance(storage, JSONLogStorage)
+        assert storage.compact() is True
+        assert len((tmp_path / "foo.jsonl").read_text().splitlines()) == 3
+
+        new_db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert sorted(d["cnt"] for d in new_db.all()) == [0, 10]
+        # The compacted file was detected by the opened database
+        db.insert({"word": "baz", "cnt": 0})
+        assert len(new_db.all()) == 3
+
+    def test_rewritten_in_place(self, tmp_path):
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        db.insert_multiple([{"word": "foo"}, {"word": "bar"}])
+        other_db = open_db(tmp_path / "bar.jsonl", storage=JSONLogStorage)
+        other_db.insert_multiple([{"word": w} for w in ["baz", "qux", "quux"]])
+
+        # The inode and the replayed lines are the same, but the epoch has changed
+        inode = (tmp_path / "foo.jsonl").stat().st_ino
+        (tmp_path / "foo.jsonl").write_bytes((tmp_path / "bar.jsonl").read_bytes())
+        assert (tmp_path / "foo.jsonl").stat().st_ino == inode
+        assert sorted(d["word"] for d in db.all()) == ["baz", "quux", "qux"]
+
+    def test_import_json_db(self, tmp_path):
+        db = open_db(tmp_path / "foo.json")
+        db.insert_multiple([{"word": "foo"}, {"word": "bar"}])
+        db.table("baz").insert({"word": "baz"})
+
+        assert import_json_db(tmp_path / "foo.json", tmp_path / "foo.jsonl") is True
+        log_db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert [d["word"] for d in log_db.all()] == ["foo", "bar"]
+        assert [d["word"] for d in log_db.table("baz").all()] == ["baz"]
+
+        # The log file exists already, or there is nothing to import
+        assert import_json_db(tmp_path / "foo.json", tmp_path / "foo.jsonl") is False
+        assert import_json_db(tmp_path / "x.json", tmp_path / "x.jsonl") is False
+        assert not (tmp_path / "x.jsonl").exists()
+
+    def test_compact_by_many_processes(self, tmp_path):
+        ctx = multiprocessing.get_context("spawn")
+        processes = [
+            ctx.Process(target=_insert_and_compact, args=(tmp_path / "foo.jsonl", name))
+            for name in ["foo", "bar"]
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        assert [p.exitcode for p in processes] == [0, 0]
+
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert len(db.all()) == 200
+        assert all(d["cnt"] == 1 for d in db.all())
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "foo.jsonl",
+            "foo.jsonl.lock",
+        ]
+
+    def test_incomplete_line(self, tmp_path):
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        db.insert({"word": "foo"})
+        # Simulate a crash in the middle of writing a line
+        with open(tmp_path / "foo.jsonl", "a") as fp:
+            fp.write('{"table": "_default", "id": "2", "doc": {"wo')
+
+        new_db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert len(new_db.all()) == 1
+        new_db.insert({"word": "bar"})
+        assert sorted(d["word"] for d in db.all()) == ["bar", "foo"]
+
+
+def _insert_and_compact(path, name):
+    db = open_db(path, storage=JSONLogStorage)
+    for i in range(100):
+        doc_id = db.insert({"word": f"{name}{i}", "cnt": 0})
+        db.update({"cnt": 1}, doc_ids=[doc_id])
+        if i % 5 == 0:
+            db.storage.compact()
@@ -1,19 +1,31 @@
 import datetime
 import importlib
 import os
+import threading
 import time
 from dataclasses import asdict
 from pathlib import Path
+from unittest import mock
 
-from tinydb import Query
+import pytest
+from tinydb.storages import JSONStorage
 
 from voc_builder.builder.models import WordProgress, WordSample
 from voc_builder.infras import config
+from voc_builder.infras.storages import CachedJSONStorage, JSONLogStorage, open_db
 from voc_builder.infras.store import (
+    META_TABLE_NAME,
+    PARAGRAPHS_TABLE_NAME,
+    WORD_SCHEMA_VERSION,
     InternalStateStore,
     MasteredWordStore,
     SystemSettingsStore,
     WordStore,
+    compact_word_doc,
+    get_mastered_word_store,
+    get_word_store,
+    run_store_io,
+    store_registry,
 )
 from voc_builder.system.models import GeminiConfig, OpenAIConfig, SystemSettings
 
@@ -38,6 +50,26 @@ class TestMasteredWordsStore:
         mastered_words_s.add("program")
         assert mastered_words_s.exists("program") is True
 
+    def test_modified_by_others(self, tmp_path):
+        mastered_words_s = MasteredWordStore(tmp_path / "foo.json")
+        mastered_words_s.add("program")
+        assert mastered_words_s.filter({"program", "python"}) == {"program"}
+
+        other_store = MasteredWordStore(tmp_path / "foo.json")
+        other_store.add("python")
+        other_store.remove("program")
+        assert mastered_words_s.filter({"program", "python"}) == {"python"}
+        assert mastered_words_s.all() == ["python"]
+
+    def test_many(self, tmp_path):
+        mastered_words_s = MasteredWordStore(tmp_path / "foo.json")
+        mastered_words_s.add("program")
+        mastered_words_s.add_many(["program", "python", "java", "python"])
+        assert sorted(mastered_words_s.all()) == ["java", "program", "python"]
+
+        mastered_words_s.remove_many(["program", "java", "missing"])
+        assert mastered_words_s.all() == ["python"]
+
     def test_remove(self, tmp_path):
         mastered_words_s = MasteredWordStore(tmp_path / "foo.json")
         mastered_words_s.add("program")
@@ -88,6 +120,32 @@ class TestWordStore:
         yesterday = today - datetime.timedelta(days=1)
         assert len(word_store.list_by_date_range(yesterday, yesterday)) == 0
 
+    def test_list_by_date_range_boundaries(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        day = datetime.date(2024, 1, 10)
+        midnight = datetime.datetime.combine(day, datetime.time.min).timestamp()
+        word_store.add(WordSample.make_empty("before"), ts_date_added=midnight - 1)
+        word_store.add(WordSample.make_empty("start"), ts_date_added=midnight)
+        word_store.add(WordSample.make_empty("end"), ts_date_added=midnight + 86399)
+        word_store.add(WordSample.make_empty("after"), ts_date_added=midnight + 86400)
+
+        words = [obj.word for obj in word_store.list_by_date_range(day, day)]
+        assert words == ["start", "end"]
+
+    def test_date_index_in_sync(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample.make_empty("program"), ts_date_added=1000)
+        word_store.add(WordSample.make_empty("python"), ts_date_added=2000)
+        # Adding an existing word again moves it to the latest
+        word_store.add(WordSample.make_empty("program"), ts_date_added=3000)
+        assert [obj.word for obj in word_store.list_latest()] == ["python", "program"]
+
+        other_store = WordStore(tmp_path / "foo.json")
+        other_store.remove("python")
+        other_store.add(WordSample.make_empty("java"), ts_date_added=1500)
+        assert [obj.word for obj in word_store.list_latest()] == ["java", "program"]
+        assert word_store.list_latest(limit=5)[-1].word == "program"
+
     def test_story_words(self, tmp_path):
         word_store = WordStore(tmp_path / "foo.json")
         for s in "Python program language is easy to read and write".split():
@@ -108,12 +166,198 @@ class TestWordStore:
         new_words = word_store.pick_story_words(count=1)
         assert new_words[0] != first_word
 
+    def test_quiz_words(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        for s in "Python program language is easy to read and write".split():
+            word_store.add(WordSample.make_empty(s))
+
+        words = word_store.pick_quiz_words(count=5)
+        word_store.update_quiz_words(words)
+        for w in words:
+            obj = word_store.get(w.word)
+            assert obj
+            assert obj.wp.quiz_cnt == 1
+            assert obj.wp.ts_date_quiz is not None
+
+        # Picked words should not be picked again until others were used
+        new_words = word_store.pick_quiz_words(count=2)
+        assert not {w.word for w in new_words} & {w.word for w in words}
+
+    def test_pick_least_used(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        for i in range(20):
+            word_store.add(WordSample.make_empty(f"word{i}"), ts_date_added=1000 + i)
+        # Mark all words as used except the last 3
+        word_store.update_progresses(
+            [
+                WordProgress(
+                    word=f"word{i}", ts_date_quiz=2000 + i, ts_date_storied=2000
+                )
+                for i in range(17)
+            ]
+        )
+
+        words = {w.word for w in word_store.pick_quiz_words(count=2)}
+        assert words <= {"word17", "word18", "word19"}
+        words = {w.word for w in word_store.pick_story_words(count=2)}
+        assert words <= {"word17", "word18", "word19"}
+
+    def test_update_progresses(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("python"))
+        word_store.update_progresses(
+            [
+                WordProgress(word="program", quiz_cnt=3),
+                WordProgress(word="python", storied_cnt=2),
+                WordProgress(word="missing", storied_cnt=1),
+            ]
+        )
+
+        new_store = WordStore(tmp_path / "foo.json")
+        obj = new_store.get("program")
+        assert obj
+        assert obj.wp.quiz_cnt == 3
+        obj = new_store.get("python")
+        assert obj
+        assert obj.wp.storied_cnt == 2
+        assert new_store.exists("missing") is False
+
+    def test_remove_many(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        for word in ["python", "java", "rust"]:
+            word_store.add(WordSample(word, word, "", [], "Languages", ""))
+        word_store.update_progresses([WordProgress(word="python", quiz_cnt=1)])
+
+        assert len(word_store.remove_many(["python", "java", "missing"])) == 2
+        assert [obj.word for obj in word_store.list_latest()] == ["rust"]
+        # The shared paragraph is kept until the last word is removed
+        obj = WordStore(tmp_path / "foo.json").get("rust")
+        assert obj
+        assert obj.ws.orig_text == "Languages"
+        assert word_store.remove_many(["rust"]) == [3]
+        assert len(open_db(tmp_path / "foo.json").table(PARAGRAPHS_TABLE_NAME)) == 0
+        assert open_db(tmp_path / "foo_json_progress.jsonl", JSONLogStorage).all() == []
+
+    def test_concurrent_writes(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        words = [f"word{i}" for i in range(30)]
+
+        def _run_in_threads(func):
+            threads = [threading.Thread(target=func) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        def _add():
+            for w in words:
+                word_store.add(WordSample(w, w, "", [], f"{w} in a sentence", ""))
+
+        _run_in_threads(_add)
+        assert word_store.count() == 30
+        assert [obj.word for obj in word_store.list_latest()] == words
+        assert len(open_db(tmp_path / "foo.json").all()) == 30
+        assert WordStore(tmp_path / "foo.json").count() == 30
+
+        _run_in_threads(lambda: [word_store.remove_many([w]) for w in words])
+        assert word_store.count() == 0
+        assert word_store.list_latest() == []
+        assert len(open_db(tmp_path / "foo.json").table(PARAGRAPHS_TABLE_NAME)) == 0
+
+    def test_compact_word_doc(self):
+        strings: dict = {}
+        docs = [
+            {"ws": {"word": w, "word_normal": "".join(w), "paragraph_id": "".join("ab")}}
+            for w in ["python", "java"]
+        ]
+        for d in docs:
+            compact_word_doc(d, strings)
+        assert docs[0]["ws"]["paragraph_id"] is docs[1]["ws"]["paragraph_id"]
+        assert docs[0]["ws"]["word_normal"] is docs[0]["ws"]["word"]
+        assert strings == {"ab": "ab"}
+
+    def test_write_once(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample("python", "python", "", [], "Languages", ""))
+        with mock.patch.object(
+            JSONStorage, "write", autospec=True, side_effect=JSONStorage.write
+        ) as write:
+            # Replace the word and its paragraph
+            word_store.add(WordSample("python", "python", "", [], "Snakes", ""))
+            assert write.call_count == 1
+            word_store.add(WordSample("java", "java", "", [], "Languages", ""))
+            assert write.call_count == 2
+            word_store.remove_many(["python", "java"])
+            assert write.call_count == 3
+
+        new_store = WordStore(tmp_path / "foo.json")
+        assert new_store.count() == 0
+        assert len(open_db(tmp_path / "foo.json").table(PARAGRAPHS_TABLE_NAME)) == 0
+
+    def test_progresses_in_separate_file(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample.make_empty("program"))
+        content = (tmp_path / "foo.json").read_text()
+        word_store.update_progresses([WordProgress(word="program", quiz_cnt=1)])
+        word_store.update_progresses([WordProgress(word="program", quiz_cnt=2)])
+
+        # Only the progress file was changed
+        assert (tmp_path / "foo.json").read_text() == content
+        obj = WordStore(tmp_path / "foo.json").get("program")
+        assert obj
+        assert obj.wp.quiz_cnt == 2
+
+        # Adding the word again starts over the progress
+        word_store.add(WordSample.make_empty("program"))
+        obj = WordStore(tmp_path / "foo.json").get("program")
+        assert obj
+        assert obj.wp.quiz_cnt == 0
+
     def test_filter(self, tmp_path):
         word_store = WordStore(tmp_path / "foo.json")
         word_store.add(WordSample.make_empty("program"))
         word_store.add(WordSample.make_empty("python"))
         assert word_store.filter({"foo", "python", "bar"}) == {"python"}
 
+    def test_index_in_sync(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("python"))
+        word_store.remove("program")
+        assert word_store.filter({"program", "python"}) == {"python"}
+        assert word_store.get("program") is None
+
+        # A new store instance should see the same data
+        new_store = WordStore(tmp_path / "foo.json")
+        assert new_store.exists("python") is True
+        assert new_store.exists("program") is False
+
+    def test_shared_strings(self, tmp_path):
+        orig_text = "Python is a programming language"
+        for word in ["python", "programming"]:
+            ws = WordSample(word, word, "", [], orig_text[:], "")
+            WordStore(tmp_path / "foo.json").add(ws)
+
+        # The words from the same sentence share the text in memory
+        objs = list(WordStore(tmp_path / "foo.json").all())
+        assert objs[0].ws.orig_text is objs[1].ws.orig_text
+        assert objs[0].ws.word_normal is objs[0].wp.word
+
+    def test_count(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        assert word_store.count() == 0
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("python"))
+        assert word_store.count() == 2
+
+        # Words changed by others should be counted
+        other_store = WordStore(tmp_path / "foo.json")
+        other_store.add(WordSample.make_empty("java"))
+        other_store.remove("program")
+        assert word_store.count() == 2
+        assert {obj.word for obj in word_store.all()} == {"python", "java"}
+
     def test_search(self, tmp_path):
         word_store = WordStore(tmp_path / "foo.json")
         word_store.add(WordSample.make_empty("program"))
@@ -122,13 +366,87 @@ class TestWordStore:
         assert list(word_store.search("Py"))[0].ws.word == "python"
 
 
+class TestStoreRegistry:
+    def test_same_instance(self):
+        assert get_word_store() is get_word_store()
+
+    def test_modified_by_others(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample.make_empty("program"))
+        assert word_store.exists("program") is True
+
+        # Another store on the same file, e.g. in another server worker
+        other_store = WordStore(tmp_path / "foo.json")
+        other_store.add(WordSample.make_empty("python"))
+        other_store.remove("program")
+
+        assert word_store.exists("python") is True
+        assert word_store.exists("program") is False
+        assert word_store.count() == 1
+
+    def test_switch_to_jsonl(self, monkeypatch, w_sample_world):
+        get_word_store().add(w_sample_world)
+        get_word_store().update_progresses([WordProgress(word="world", quiz_cnt=2)])
+        get_mastered_word_store().add("python")
+        store_registry.close_all()
+
+        monkeypatch.setattr(config, "DB_BACKEND", "jsonl")
+        word_store = get_word_store()
+        assert isinstance(word_store, WordStore)
+        assert word_store.file_path.name == "word.jsonl"
+        obj = word_store.get("world")
+        assert obj
+        assert obj.ws.orig_text == "Hello, world!"
+        assert obj.wp.quiz_cnt == 2
+        assert get_mastered_word_store().all() == ["python"]
+
+        # The files have their own progresses
+        word_store.update_progresses([WordProgress(word="world", quiz_cnt=3)])
+        obj = WordStore(config.DEFAULT_DB_PATH / "word.json").get("world")
+        assert obj
+        assert obj.wp.quiz_cnt == 2
+
+        # Only imported once, the JSON file is not used anymore
+        word_store.remove("world")
+        store_registry.close_all()
+        assert get_word_store().count() == 0
+
+
+class TestParagraphs:
+    def test_shared_by_words(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        for word in ["python", "programming"]:
+            word_store.add(
+                WordSample(word, word, "", [], "Python is a programming language", "")
+            )
+        word_store.add(WordSample.make_empty("java"))
+
+        db = open_db(tmp_path / "foo.json")
+        assert len(db.table(PARAGRAPHS_TABLE_NAME)) == 1
+        obj = WordStore(tmp_path / "foo.json").get("programming")
+        assert obj
+        assert obj.ws.orig_text == "Python is a programming language"
+
+    def test_removed_with_words(self, tmp_path):
+        word_store = WordStore(tmp_path / "foo.json")
+        word_store.add(WordSample("python", "python", "", [], "Python is easy", ""))
+        word_store.add(WordSample("easy", "easy", "", [], "Python is easy", ""))
+        # Add the word again with a different paragraph
+        word_store.add(WordSample("easy", "easy", "", [], "It's easy", ""))
+
+        paragraphs = open_db(tmp_path / "foo.json").table(PARAGRAPHS_TABLE_NAME)
+        assert len(paragraphs) == 2
+        word_store.remove("python")
+        assert [d["orig_text"] for d in paragraphs.all()] == ["It's easy"]
+        word_store.remove("easy")
+        assert len(paragraphs) == 0
+
+
 class TestDifferentWordVersion:
     """Test if the word store is able to handle data in legacy versions"""
 
     def test_get_without_word_normal_form(self, tmp_path):
         """Test word without "word_normal_form" field(version <= 0.2.0)"""
-        word_store = WordStore(tmp_path / "foo.json")
-        Word = Query()
         data = {
             "word": "program",
             "word_meaning": "",
@@ -136,19 +454,71 @@ class TestDifferentWordVersion:
             "orig_text": "",
             "translated_text": "",
         }
-        word_store._db.upsert(
-            {
-                "ws": data,
-                "wp": asdict(WordProgress(word=data["word"])),
-                "ts_date_added": time.time(),
-            },
-            Word.ws.word == data["word"],
-        )
+        self._write_legacy_doc(tmp_path / "foo.json", data)
+
+        word_store = WordStore(tmp_path / "foo.json")
         obj = word_store.get("program")
         assert obj
         assert obj.word == "program"
+        assert obj.ws.definitions == []
         assert len(list(word_store.all())) == 1
 
+    def test_upgrade_once(self, tmp_path):
+        data = {
+            "word": "program",
+            "word_normal": "program",
+            "word_meaning": "程序",
+            "pronunciation": "",
+            "orig_text": "",
+            "translated_text": "",
+        }
+        self._write_legacy_doc(tmp_path / "foo.jsonl", data)
+
+        word_store = WordStore(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        obj = word_store.get("program")
+        assert obj
+        assert obj.ws.definitions == ["程序"]
+
+        # The upgraded documents were saved, with the schema version
+        db = open_db(tmp_path / "foo.jsonl", storage=JSONLogStorage)
+        assert db.all()[0]["ws"]["definitions"] == ["程序"]
+        assert db.table(META_TABLE_NAME).all() == [
+            {"schema_version": WORD_SCHEMA_VERSION}
+        ]
+
+    def test_upgrade_paragraphs(self, tmp_path):
+        for word in ["python", "easy"]:
+            data = asdict(WordSample(word, word, "", [], "Python is easy", "..."))
+            self._write_legacy_doc(tmp_path / "foo.json", data)
+
+        word_store = WordStore(tmp_path / "foo.json")
+        assert [obj.ws.orig_text for obj in word_store.all()] == ["Python is easy"] * 2
+
+        db = open_db(tmp_path / "foo.json")
+        assert "orig_text" not in db.all()[0]["ws"]
+        assert len(db.table(PARAGRAPHS_TABLE_NAME)) == 1
+
+    def test_upgrade_progresses(self, tmp_path):
+        data = asdict(WordSample.make_empty("program"))
+        self._write_legacy_doc(tmp_path / "foo.json", data, quiz_cnt=3)
+
+        word_store = WordStore(tmp_path / "foo.json")
+        obj = word_store.get("program")
+        assert obj
+        assert obj.wp.quiz_cnt == 3
+        assert "wp" not in open_db(tmp_path / "foo.json").all()[0]
+
+    @staticmethod
+    def _write_legacy_doc(file_path: Path, data: dict, quiz_cnt: int = 0):
+        storage = JSONLogStorage if file_path.suffix == ".jsonl" else CachedJSONStorage
+        open_db(file_path, storage=storage).insert(
+            {
+                "ws": data,
+                "wp": asdict(WordProgress(word=data["word"], quiz_cnt=quiz_cnt)),
+                "ts_date_added": time.time(),
+            }
+        )
+
 
 class TestInternalStateStore:
     def test_state(self, tmp_path):
@@ -180,6 +550,30 @@ class TestSysSettingsStore:
 
         assert saved_settings == settings
 
+    def test_cached_settings(self, tmp_path):
+        store = SystemSettingsStore(tmp_path / "foo.json")
+        store.set_system_settings(
+            SystemSettings(
+                model_provider="openai",
+                openai_config=OpenAIConfig(api_key="", api_host="", model=""),
+                gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+            )
+        )
+        assert store.get_system_settings() is store.get_system_settings()
+
+        # Save the settings by another store, such as in another process
+        other_store = SystemSettingsStore(tmp_path / "foo.json")
+        other_store.set_system_settings(
+            SystemSettings(
+                model_provider="gemini",
+                openai_config=OpenAIConfig(api_key="", api_host="", model=""),
+                gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+            )
+        )
+        settings = store.get_system_settings()
+        assert settings
+        assert settings.model_provider == "gemini"
+
 
 class TestStoreDir:
     def test_mocked_location(self, tmp_path):
@@ -201,3 +595,11 @@ class TestStoreDir:
         data_dir = Path(os.environ["AIVOC_DATA_DIR"]).expanduser()
         assert config.DEFAULT_DB_PATH == data_dir / ".aivoc_db"
         assert config.DEFAULT_CSV_FILE_PATH == data_dir / "aivoc_builder.csv"
+
+
+@pytest.mark.asyncio
+async def test_run_store_io(w_sample_world):
+    word_store = get_word_store()
+    await run_store_io(word_store.add, w_sample_world)
+    assert await run_store_io(word_store.exists, "world") is True
+    assert await run_store_io(lambda: get_word_store().count()) == 1
@@ -0,0 +1,185 @@
+import datetime
+import json
+import sqlite3
+import time
+from dataclasses import asdict
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras.store_sqlite import (
+    SCHEMA_UPGRADES,
+    SQLiteInternalStateStore,
+    SQLiteMasteredWordStore,
+    SQLiteSystemSettingsStore,
+    SQLiteWordStore,
+)
+from voc_builder.system.models import GeminiConfig, OpenAIConfig, SystemSettings
+
+
+class TestSQLiteMasteredWordStore:
+    def test_basic(self, tmp_path):
+        store = SQLiteMasteredWordStore(tmp_path / "foo.sqlite3")
+        store.add("program")
+        store.add("program")
+        store.add("python")
+        assert set(store.all()) == {"python", "program"}
+        assert store.filter({"foo", "python", "bar"}) == {"python"}
+
+        store.remove("program")
+        assert store.exists("program") is False
+        assert store.exists("python") is True
+
+        store.add_many(["java", "rust", "java"])
+        store.remove_many(["python", "java"])
+        assert set(store.all()) == {"rust"}
+
+
+class TestSQLiteWordStore:
+    def test_misc(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("program"))
+        word_store.add(WordSample.make_empty("python"))
+        assert word_store.count() == 2
+        assert word_store.filter({"foo", "python", "bar"}) == {"python"}
+        obj = word_store.get("program")
+        assert obj
+        assert obj.word == "program"
+        assert list(word_store.search("Py"))[0].ws.word == "python"
+
+        word_store.remove("program")
+        assert word_store.count() == 1
+        assert word_store.exists("program") is False
+
+    def test_search_case_insensitive(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        word_store.add(WordSample.make_empty("Python"))
+        word_store.add(WordSample.make_empty("rust"))
+        assert [obj.ws.word for obj in word_store.search("pyth")] == ["Python"]
+        assert [obj.ws.word for obj in word_store.search("RUS")] == ["rust"]
+
+    def test_list_latest(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        for i in range(50):
+            word_store.add(WordSample.make_empty(f"word{i}"), ts_date_added=1000 + i)
+
+        items = word_store.list_latest(limit=10)
+        assert [w.word for w in items] == [f"word{i}" for i in range(40, 50)]
+        assert len(word_store.list_latest()) == 50
+
+    def test_list_by_date_range(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        word_store.add(WordSample.make_empty("word"))
+
+        today = datetime.date.today()
+        assert len(word_store.list_by_date_range(today, today)) == 1
+
+        yesterday = today - datetime.timedelta(days=1)
+        assert len(word_store.list_by_date_range(yesterday, yesterday)) == 0
+
+    def test_story_words(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        for s in "Python program language is easy to read and write".split():
+            word_store.add(WordSample.make_empty(s))
+
+        words = word_store.pick_story_words(count=1)
+        word_store.update_story_words(words)
+        obj = word_store.get(words[0].word)
+        assert obj
+        assert obj.wp.storied_cnt == 1
+        assert obj.wp.ts_date_storied is not None
+        assert word_store.pick_story_words(count=1)[0] != words[0]
+
+    def test_update_progresses(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        word_store.add(WordSample.make_empty("program"))
+        word_store.update_progresses(
+            [WordProgress(word="program", quiz_cnt=3, ts_date_quiz=time.time())]
+        )
+
+        obj = SQLiteWordStore(tmp_path / "foo.sqlite3").get("program")
+        assert obj
+        assert obj.wp.quiz_cnt == 3
+
+    def test_paragraphs(self, tmp_path):
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        word_store.add(WordSample("python", "python", "", [], "Python is easy", "."))
+        word_store.add(WordSample("easy", "easy", "", [], "Python is easy", "."))
+        assert [obj.ws.orig_text for obj in word_store.all()] == ["Python is easy"] * 2
+        assert self._count_paragraphs(word_store) == 1
+
+        word_store.remove("python")
+        assert self._count_paragraphs(word_store) == 1
+        word_store.remove_many(["easy", "missing"])
+        assert self._count_paragraphs(word_store) == 0
+        assert word_store.count() == 0
+
+    def test_upgrade_paragraphs(self, tmp_path):
+        # A database created before the paragraphs were introduced
+        conn = sqlite3.connect(tmp_path / "foo.sqlite3")
+        for sql in SCHEMA_UPGRADES[0]:
+            conn.execute(sql)
+        ws = asdict(WordSample("python", "python", "", [], "Python is easy", "."))
+        conn.execute(
+            "INSERT INTO words (word, ws, ts_date_added) VALUES (?, ?, ?)",
+            ("python", json.dumps(ws), time.time()),
+        )
+        conn.commit()
+        conn.close()
+
+        word_store = SQLiteWordStore(tmp_path / "foo.sqlite3")
+        obj = word_store.get("python")
+        assert obj
+        assert obj.ws == WordSample("python", "python", "", [], "Python is easy", ".")
+        assert self._count_paragraphs(word_store) == 1
+
+    @staticmethod
+    def _count_paragraphs(word_store: SQLiteWordStore) -> int:
+        return word_store._db.query("SELECT COUNT(*) FROM paragraphs")[0][0]
+
+
+class TestSQLiteStateStores:
+    def test_internal_state(self, tmp_path):
+        state_store = SQLiteInternalStateStore(tmp_path / "foo.sqlite3")
+        state = state_store.get_internal_state()
+        assert state.last_ver_checking_ts == -1
+
+        state.last_ver_checking_ts = time.time()
+        state_store.set_internal_state(state)
+        assert state_store.get_internal_state().last_ver_checking_ts > 0
+
+    def test_system_settings(self, tmp_path):
+        store = SQLiteSystemSettingsStore(tmp_path / "foo.sqlite3")
+        assert store.get_system_settings() is None
+
+        settings = SystemSettings(
+            model_provider="openai",
+            openai_config=OpenAIConfig(
+                api_key="test_key", api_host="test_host", model="gtp-4o"
+            ),
+            gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+        )
+        store.set_system_settings(settings)
+        assert store.get_system_settings() == settings
+
+    def test_cached_settings(self, tmp_path):
+        store = SQLiteSystemSettingsStore(tmp_path / "foo.sqlite3")
+        store.set_system_settings(
+            SystemSettings(
+                model_provider="openai",
+                openai_config=OpenAIConfig(api_key="", api_host="", model=""),
+                gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+            )
+        )
+        assert store.get_system_settings() is store.get_system_settings()
+
+        other_store = SQLiteSystemSettingsStore(tmp_path / "foo.sqlite3")
+        other_store.set_system_settings(
+            SystemSettings(
+                model_provider="gemini",
+                openai_config=OpenAIConfig(api_key="", api_host="", model=""),
+                gemini_config=GeminiConfig(api_key="", api_host="", model=""),
+            )
+        )
+        settings = store.get_system_settings()
+        assert settings
+        assert settings.model_provider == "gemini"
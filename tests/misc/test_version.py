@@ -1,7 +1,48 @@
-from voc_builder.misc.version import JohnnyDist
+import time
+from unittest import mock
+
+import pytest
+
+from voc_builder.infras.store import get_internal_state_store
+from voc_builder.misc.version import JohnnyDist, check_latest_version, get_new_version
 
 
 def test__JohnnyDist():
     _ = JohnnyDist(
         "ai-vocabulary-builder", index_urls=["https://piglei.com/"]
     ).versions_available()
+
+
+@mock.patch("voc_builder.misc.version.JohnnyDist")
+class TestVersionChecking:
+    def test_new_version(self, mocked_dist):
+        mocked_dist.return_value.versions_available.return_value = ["0.1", "999.0"]
+        assert get_new_version() is None
+
+        check_latest_version()
+        assert get_new_version() == "999.0"
+        assert get_internal_state_store().get_internal_state().last_ver_checking_ts > 0
+
+    def test_no_new_version(self, mocked_dist):
+        mocked_dist.return_value.versions_available.return_value = ["0.1"]
+        check_latest_version()
+        assert get_new_version() is None
+
+    def test_checked_recently(self, mocked_dist):
+        state_store = get_internal_state_store()
+        state = state_store.get_internal_state()
+        state.last_ver_checking_ts = time.time()
+        state_store.set_internal_state(state)
+
+        check_latest_version()
+        assert not mocked_dist.called
+
+    def test_checking_failed(self, mocked_dist):
+        mocked_dist.return_value.versions_available.side_effect = ValueError(
+            "index unavailable"
+        )
+        with pytest.raises(ValueError, match="index unavailable"):
+            check_latest_version()
+        # The checking time is saved, so it will not be retried immediately
+        assert get_internal_state_store().get_internal_state().last_ver_checking_ts > 0
+        assert get_new_version() is None
@@ -1,14 +1,19 @@
+import hashlib
+import json
 import logging
 import re
 from typing import Any, AsyncGenerator, List, Set
 
 from pydantic import BaseModel
-from pydantic_ai import Agent
 
 from voc_builder.builder.models import WordChoice
-from voc_builder.common.text import get_word_candidates
+from voc_builder.common.text import get_word_candidates, split_sentences
 from voc_builder.exceptions import AIServiceError
-from voc_builder.infras.ai import AIResultMode, PromptText
+from voc_builder.infras import config
+from voc_builder.infras.ai import AIResultMode, PromptText, get_agent, get_model_id
+from voc_builder.infras.cache import LRUCacheStore
+from voc_builder.infras.converter import converter
+from voc_builder.infras.store import run_store_io, store_registry
 
 logger = logging.getLogger()
 
@@ -30,22 +35,114 @@ class WordChoiceModelResp(BaseModel):
         return [d.strip() for d in self.definitions.split("$")]
 
 
-async def get_translation(model, text: str, language: str) -> AsyncGenerator[str, None]:
+async def get_translation(
+    model, text: str, language: str, delta: bool = False
+) -> AsyncGenerator[str, None]:
     """Get the translated text of the given text.
 
     :param text: The text which needs to be translated.
     :param language: The target language.
+    :param delta: Whether to yield only the new text instead of the full text so far.
     :return: The translation text.
     :raise AIServiceError: when unable to finish the API call or reply is malformed.
     """
 
     try:
-        async for translated_text in query_translation(model, text, language):
+        async for translated_text in translate_with_memory(model, text, language, delta):
             yield translated_text
     except Exception as e:
         raise AIServiceError("Error calling AI backend API: %s" % e)
 
 
+async def translate_with_memory(
+    model, text: str, language: str, delta: bool = False
+) -> AsyncGenerator[str, None]:
+    """Translate the text by sentences, the sentences translated before are served
+    from the translation memory, each run of the other sentences is sent to the AI
+    in one request. The translations are stitched together in order.
+
+    :param delta: Whether to yield only the new text instead of the full text so far.
+    """
+    sentences = split_sentences(text)
+    memory = get_translation_memory()
+    keys = [make_translation_key(model, s, language) for s, _ in sentences]
+    known = await run_store_io(memory.get_many, keys)
+
+    # The full text translated so far
+    done = ""
+    i = 0
+    while i < len(sentences):
+        # Sentences are joined by the separators of the original text
+        sep = translate_separator(sentences[i - 1][1], done) if i else ""
+        if (translation := known[i]) is not None:
+            done += sep + translation
+            yield sep + translation if delta else done
+            i += 1
+            continue
+
+        j = i
+        while j < len(sentences) and known[j] is None:
+            j += 1
+        run_text = "".join(s + s_sep for s, s_sep in sentences[i:j]).rstrip()
+        translated = ""
+        if delta and sep:
+            yield sep
+        async for piece in query_translation(model, run_text, language, delta):
+            translated = translated + piece if delta else piece
+            yield piece if delta else done + sep + piece
+        done += sep + translated
+
+        await run_store_io(save_translations, memory, keys[i:j], translated)
+        i = j
+
+
+# The characters of the languages which don't put spaces between sentences, such as
+# Chinese and Japanese, including their punctuations. Korean uses spaces like English.
+_NO_SPACE_CHARS = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def translate_separator(sep: str, translated: str) -> str:
+    """Get the separator between two translated sentences from the one in the original
+    text, only the line breaks are kept if the translation doesn't use spaces.
+
+    :param sep: The separator in the original text.
+    :param translated: The translated text before the separator.
+    """
+    if translated and _NO_SPACE_CHARS.match(translated[-1]):
+        return "\n" * sep.count("\n")
+    return sep
+
+
+def save_translations(memory: LRUCacheStore, keys: List[str], translated: str):
+    """Save the translation of some sentences to the translation memory, the
+    translation is split into sentences and saved only if the sentences match.
+
+    :param keys: The keys of the original sentences.
+    :param translated: The translation of the original sentences.
+    """
+    sentences = [s for s, _ in split_sentences(translated) if s]
+    if len(sentences) != len(keys):
+        logger.debug("Unable to match the translated sentences, skip saving.")
+        return
+    for key, sentence in zip(keys, sentences, strict=True):
+        memory.set(key, sentence)
+
+
+def get_translation_memory() -> LRUCacheStore:
+    """Get the translation memory, which stores the translated sentences."""
+    return store_registry.get(
+        LRUCacheStore,
+        config.DEFAULT_DB_PATH / "translation_memory.jsonl",
+        max_size=config.TRANSLATION_MEMORY_SIZE,
+    )
+
+
+def make_translation_key(model, sentence: str, language: str) -> str:
+    """Make the key of a sentence in the translation memory."""
+    data = json.dumps([get_model_id(model), sentence, language])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
 # The prompt being used to translate text
 prompt_main_system = """\
 You are a translation assistant. I will provide you with a paragraph in English. \
@@ -61,15 +158,15 @@ The paragraph is:
 
 
 async def query_translation(
-    model, text: str, language: str
+    model, text: str, language: str, delta: bool = False
 ) -> AsyncGenerator[str, None]:
     """Query the AI to get the translation."""
     user_content = prompt_main_user_tmpl.format(text=text)
     prompt = prompt_main_system.format(language=language) + "\n" + user_content
-    agent: Agent = Agent(model)
+    agent = get_agent(model)
 
     async with agent.run_stream(prompt) as result:
-        async for message in result.stream():
+        async for message in result.stream_text(delta=delta):
             yield message
 
 
@@ -101,19 +198,27 @@ Paragraph for reference: {text}"""
 
     async def query(self, text: str, known_words: Set[str], language: str) -> WordChoice:
         """Query the most rarely word in the given text."""
-        words = get_word_candidates(text, known_words=known_words)
+        words = get_word_candidates(
+            text, known_words=known_words, limit=config.RARE_WORD_CANDIDATES_LIMIT
+        )
         if not words:
             raise AIServiceError(
                 "Text does not contain any words that meet the criteria"
             )
+        # There is nothing to choose, query the definitions of the word directly
+        if len(words) == 1:
+            return await ManuallyWordQuerier(self.model, self.result_mode).query(
+                text, words.pop(), language
+            )
 
         prompt = PromptText(
             system_lines=[self.prompt_system_tmpl.format(language=language)],
-            user_lines=[self.prompt_user_tmpl.format(text=text, words=", ".join(words))],
-        )
-        return await word_def_getter_factory(self.result_mode).query(
-            self.model, prompt, language
+            # Sort the words, so the prompt is the same for the same text
+            user_lines=[
+                self.prompt_user_tmpl.format(text=text, words=", ".join(sorted(words)))
+            ],
         )
+        return await query_word_def(self.model, self.result_mode, prompt, language)
 
 
 class ManuallyWordQuerier:
@@ -139,9 +244,45 @@ Paragraph for reference: {text}"""
             system_lines=[self.prompt_system_tmpl.format(language=language)],
             user_lines=[self.prompt_user_tmpl.format(text=text, word=word)],
         )
-        return await word_def_getter_factory(self.result_mode).query(
-            self.model, prompt, language
-        )
+        return await query_word_def(self.model, self.result_mode, prompt, language)
+
+
+async def query_word_def(
+    model, result_mode: AIResultMode, prompt: PromptText, language: str
+) -> WordChoice:
+    """Query the AI to get the word definition, the result is cached, so the same
+    prompt will not be sent to the AI again.
+
+    :param model: The AI model object.
+    :param result_mode: The mode to get the AI result.
+    :param prompt: The prompt text, it should make the AI return a word.
+    :param language: The language of the word definition.
+    """
+    cache = get_word_def_cache()
+    key = make_word_def_cache_key(model, prompt, language)
+    if cached := await run_store_io(cache.get, key):
+        return converter.structure(cached, WordChoice)
+
+    choice = await word_def_getter_factory(result_mode).query(model, prompt, language)
+    await run_store_io(cache.set, key, converter.unstructure(choice))
+    return choice
+
+
+def get_word_def_cache() -> LRUCacheStore:
+    """Get the cache of the word definitions returned by the AI."""
+    return store_registry.get(
+        LRUCacheStore,
+        config.DEFAULT_DB_PATH / "word_def_cache.jsonl",
+        max_size=config.WORD_DEF_CACHE_SIZE,
+    )
+
+
+def make_word_def_cache_key(model, prompt: PromptText, language: str) -> str:
+    """Make the cache key of a word definition query, the AI provider and model are
+    included because different models might give different results.
+    """
+    data = json.dumps([get_model_id(model), prompt.system, prompt.user, language])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
 
 
 def word_def_getter_factory(result_mode: AIResultMode) -> "BaseWordDefGetter":
@@ -205,7 +346,7 @@ EXAMPLE JSON OUTPUT:
         return self._to_word_choice(item)
 
     async def agent_request(self, model, prompt: PromptText) -> Any:
-        agent: Agent = Agent(model, system_prompt=prompt.system)
+        agent = get_agent(model, prompt.system)
         try:
             return await agent.run(prompt.user)
         except Exception as e:
@@ -229,11 +370,7 @@ class PydanticWordDefGetter(BaseWordDefGetter):
         return self._to_word_choice(result.output)
 
     async def agent_request(self, model, prompt: PromptText) -> Any:
-        agent: Agent = Agent(
-            model,
-            system_prompt=prompt.system,
-            output_type=WordChoiceModelResp,  # type: ignore
-        )
+        agent = get_agent(model, prompt.system, WordChoiceModelResp)
         try:
             return await agent.run(prompt.user)
         except Exception as e:
@@ -5,7 +5,7 @@ from typing import List, Optional
 RE_PART_OF_SPEECH = re.compile(r"^\[([a-zA-Z]+)\]")
 
 
-@dataclass
+@dataclass(slots=True)
 class WordDefinition:
     """A word definition"""
 
@@ -22,7 +22,7 @@ class WordDefinition:
         return cls("", text)
 
 
-@dataclass
+@dataclass(slots=True)
 class WordSample:
     """A word sample which is ready to be added into the vocabulary book.
 
@@ -72,7 +72,7 @@ class WordChoice:
     definitions: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class WordProgress:
     """Store the learning progress of a word.
 
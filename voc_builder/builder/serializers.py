@@ -2,10 +2,10 @@
 
 from typing import List, Optional
 
-import cattrs
 from pydantic import BaseModel, Field
 
 from voc_builder.builder.models import WordSample
+from voc_builder.infras.converter import converter
 
 
 class TranslatedTextInput(BaseModel):
@@ -61,10 +61,10 @@ class WordSampleOutput(BaseModel):
     @classmethod
     def from_db_obj(cls, ws: WordSample) -> "WordSampleOutput":
         """Create an instance from a WordSample object."""
-        d = cattrs.unstructure(ws)
+        d = converter.unstructure(ws)
         defs = ws.get_structured_definitions()
         return cls(
             simple_definition=ws.get_definitions_str(),
-            structured_definitions=cattrs.unstructure(defs),
+            structured_definitions=converter.unstructure(defs),
             **d,
         )
@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import AsyncGenerator, Dict
+from typing import AsyncGenerator, Dict, List, Set
 
 from fastapi import APIRouter, Query, Response, status
 from fastapi.responses import JSONResponse
@@ -10,9 +10,19 @@ from typing_extensions import Annotated
 from voc_builder.builder.models import WordSample
 from voc_builder.common.errors import error_codes
 from voc_builder.common.text import tokenize_text
+from voc_builder.common.web.sse import (
+    StreamMode,
+    coalesce_text,
+    make_checksum_event,
+)
 from voc_builder.exceptions import AIServiceError
+from voc_builder.infras import config
 from voc_builder.infras.ai import create_ai_model_config
-from voc_builder.infras.store import get_mastered_word_store, get_word_store
+from voc_builder.infras.store import (
+    get_mastered_word_store,
+    get_word_store,
+    run_store_io,
+)
 from voc_builder.system.language import get_target_language
 
 from .ai_svc import (
@@ -36,30 +46,48 @@ logger = logging.getLogger(__name__)
 @router.get("/api/translations/")
 def create_new_translations(
     user_text: Annotated[str, Query(min_length=12, max_length=1600)],
+    stream_mode: StreamMode = StreamMode.FULL,
 ):
     """Create a new translation, return the response in SSE protocol."""
-    return EventSourceResponse(gen_translation_sse(user_text))
+    return EventSourceResponse(gen_translation_sse(user_text, stream_mode))
 
 
-async def gen_translation_sse(text: str) -> AsyncGenerator[Dict, None]:
+async def gen_translation_sse(
+    text: str, stream_mode: StreamMode = StreamMode.FULL
+) -> AsyncGenerator[Dict, None]:
     """Generate the SSE events for the translation progress.
 
     :param text: The text to be translated.
+    :param stream_mode: In delta mode, the "trans_delta" events which contain only the
+        new text are sent instead of the "trans_partial" events.
     """
-
+    delta = stream_mode == StreamMode.DELTA
+    pieces: List[str] = []
     try:
-        model_config = create_ai_model_config()
-        async for translated_text in get_translation(
-            model_config.model, text, get_target_language()
+        model_config = await run_store_io(create_ai_model_config)
+        target_language = await run_store_io(get_target_language)
+        async for piece in coalesce_text(
+            get_translation(model_config.model, text, target_language, delta),
+            delta,
+            config.SSE_FLUSH_INTERVAL,
+            config.SSE_MIN_CHUNK_SIZE,
         ):
-            yield {
-                "event": "trans_partial",
-                "data": json.dumps({"translated_text": translated_text}),
-            }
+            if delta:
+                pieces.append(piece)
+                yield {"event": "trans_delta", "data": json.dumps({"delta": piece})}
+            else:
+                pieces = [piece]
+                yield {
+                    "event": "trans_partial",
+                    "data": json.dumps({"translated_text": piece}),
+                }
     except AIServiceError as e:
         yield {"event": "error", "data": json.dumps({"message": str(e)})}
         return
 
+    translated_text = "".join(pieces)
+    if delta:
+        yield make_checksum_event(translated_text)
     yield {
         "event": "translation",
         "data": json.dumps({"text": text, "translated_text": translated_text}),
@@ -69,18 +97,15 @@ async def gen_translation_sse(text: str) -> AsyncGenerator[Dict, None]:
 @router.post("/api/word_samples/extractions/")
 async def create_word_sample(trans_obj: TranslatedTextInput, response: Response):
     """Create a new word sample from the translated result."""
-    mastered_word_s = get_mastered_word_store()
-    word_store = get_word_store()
-
     orig_words = tokenize_text(trans_obj.orig_text)
-    # Words already in vocabulary book and marked as mastered are treated as "known"
-    known_words = word_store.filter(orig_words) | mastered_word_s.filter(orig_words)
+    known_words = await run_store_io(get_known_words, orig_words)
 
     try:
-        model_config = create_ai_model_config()
+        model_config = await run_store_io(create_ai_model_config)
+        target_language = await run_store_io(get_target_language)
         choice = await RareWordQuerier(
             model_config.model, model_config.result_mode
-        ).query(trans_obj.orig_text, known_words, get_target_language())
+        ).query(trans_obj.orig_text, known_words, target_language)
     except Exception as exc:
         logger.exception("Error extracting word.")
         raise error_codes.EXACTING_WORD_FAILED.format(str(exc))
@@ -94,12 +119,10 @@ async def create_word_sample(trans_obj: TranslatedTextInput, response: Response)
         orig_text=trans_obj.orig_text,
     )
 
-    validate_result_word(word_sample, trans_obj.orig_text)
-
-    word_store.add(word_sample)
+    count = await run_store_io(save_word_sample, word_sample, trans_obj.orig_text)
     return {
         "word_sample": WordSampleOutput.from_db_obj(word_sample),
-        "count": word_store.count(),
+        "count": count,
     }
 
 
@@ -132,10 +155,9 @@ def delete_word_samples(req: DeleteWordsInput, response: Response):
     """Delete a list of words."""
     word_store = get_word_store()
     mastered_word_s = get_mastered_word_store()
-    for word in req.words:
-        word_store.remove(word)
-        if req.mark_mastered:
-            mastered_word_s.add(word)
+    word_store.remove_many(req.words)
+    if req.mark_mastered:
+        mastered_word_s.add_many(req.words)
     response.status_code = status.HTTP_204_NO_CONTENT
 
 
@@ -165,13 +187,12 @@ def list_recent_word_samples():
 @router.post("/api/word_samples/manually_save/")
 async def manually_save(req: ManuallySelectInput, response: Response):
     """Manually save a word to the store."""
-    word_store = get_word_store()
-
     try:
-        model_config = create_ai_model_config()
+        model_config = await run_store_io(create_ai_model_config)
+        target_language = await run_store_io(get_target_language)
         choice = await ManuallyWordQuerier(
             model_config.model, model_config.result_mode
-        ).query(req.orig_text, req.word, get_target_language())
+        ).query(req.orig_text, req.word, target_language)
     except Exception as exc:
         raise error_codes.MANUALLY_SAVE_WORD_FAILED.format(str(exc))
 
@@ -184,15 +205,31 @@ async def manually_save(req: ManuallySelectInput, response: Response):
         orig_text=req.orig_text,
     )
 
-    validate_result_word(word_sample, req.orig_text)
-
-    word_store.add(word_sample)
+    count = await run_store_io(save_word_sample, word_sample, req.orig_text)
     return {
         "word_sample": WordSampleOutput.from_db_obj(word_sample),
-        "count": word_store.count(),
+        "count": count,
     }
 
 
+def get_known_words(words: Set[str]) -> Set[str]:
+    """Get the known words in the given words, words already in vocabulary book and
+    marked as mastered are treated as "known".
+    """
+    return get_word_store().filter(words) | get_mastered_word_store().filter(words)
+
+
+def save_word_sample(word: WordSample, orig_text: str) -> int:
+    """Validate and save the word to the vocabulary book.
+
+    :return: The count of words in the vocabulary book.
+    """
+    validate_result_word(word, orig_text)
+    word_store = get_word_store()
+    word_store.add(word)
+    return word_store.count()
+
+
 def validate_result_word(word: WordSample, orig_text: str):
     """Check if a result word is valid before it can be put into vocabulary book"""
     if get_word_store().exists(word.word):
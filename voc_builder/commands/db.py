@@ -0,0 +1,77 @@
+"""Handle database related commands"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List
+
+from rich.console import Console
+
+from voc_builder.infras import config
+from voc_builder.infras.storages import JSONLogStorage
+from voc_builder.infras.store import (
+    InternalStateStore,
+    MasteredWordStore,
+    SystemSettingsStore,
+    WordStore,
+    get_progress_file_path,
+    initialized_db,
+)
+from voc_builder.infras.store_sqlite import SQLITE_DB_FILENAME, migrate_from_tinydb
+
+console = Console()
+
+
+def handle_migrate(source: str):
+    """Handle the migrate command, load the data in JSON files into the SQLite database.
+    The JSON files are left untouched, they are read from temporary copies, because
+    opening the stores might upgrade the files or create new ones.
+
+    :param source: The backend of the existing data, "json" or "jsonl".
+    """
+    initialized_db()
+    db_path = config.DEFAULT_DB_PATH
+    ext = "jsonl" if source == "jsonl" else "json"
+    sqlite_path = db_path / SQLITE_DB_FILENAME
+    # The stores keep their files open, which can't be removed on Windows
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp_dir:
+        src_path = Path(tmp_dir)
+        _copy_files(
+            db_path,
+            src_path,
+            [
+                f"word.{ext}",
+                get_progress_file_path(Path(f"word.{ext}")).name,
+                f"mastered_word.{ext}",
+                "internal.json",
+                "settings.json",
+            ],
+        )
+        if source == "jsonl":
+            word_store = WordStore(src_path / "word.jsonl", storage=JSONLogStorage)
+            mastered_word_store = MasteredWordStore(
+                src_path / "mastered_word.jsonl", storage=JSONLogStorage
+            )
+        else:
+            word_store = WordStore(src_path / "word.json")
+            mastered_word_store = MasteredWordStore(src_path / "mastered_word.json")
+
+        counts = migrate_from_tinydb(
+            sqlite_path,
+            word_store,
+            mastered_word_store,
+            InternalStateStore(src_path / "internal.json"),
+            SystemSettingsStore(src_path / "settings.json"),
+        )
+    console.print(
+        f'Migrated {counts["words"]} words and {counts["mastered_words"]} mastered '
+        f'words to "{sqlite_path}".'
+    )
+    console.print('Set "AIVOC_DB_BACKEND=sqlite" to start using the SQLite database.')
+
+
+def _copy_files(src_dir: Path, dst_dir: Path, names: List[str]):
+    """Copy the files of the given names, the missing ones are skipped."""
+    for name in names:
+        if (src_dir / name).exists():
+            shutil.copy2(src_dir / name, dst_dir / name)
@@ -1,7 +1,9 @@
 """Basic utils for string and other simple types"""
 
 import re
-from typing import Optional, Set
+from typing import List, Optional, Set, Tuple
+
+from voc_builder.common.word_freq import get_word_frequency, is_word_freq_available
 
 
 def tokenize_text(text: str) -> Set[str]:
@@ -9,11 +11,15 @@ def tokenize_text(text: str) -> Set[str]:
     return {s.group().lower() for s in re.finditer(r"[a-zA-Z-]+", text)}
 
 
-def get_word_candidates(text: str, known_words: Optional[Set[str]] = None) -> Set[str]:
+def get_word_candidates(
+    text: str, known_words: Optional[Set[str]] = None, limit: Optional[int] = None
+) -> Set[str]:
     """Get words that are candidates for vocabulary building in the given text.
 
     :param text: The text to extract words from
     :param known_words: Words that are already known and should be ignored
+    :param limit: Keep only the given number of the least frequent words, ignored when
+        the word frequencies are not available.
     """
     words = tokenize_text(text)
     words = {w for w in words if w not in easy_words and len(w) > 1}
@@ -21,9 +27,42 @@ def get_word_candidates(text: str, known_words: Optional[Set[str]] = None) -> Se
     if known_words:
         known_words = {w.lower() for w in known_words}
         words = {w for w in words if w not in known_words}
+    if limit is not None and len(words) > limit and is_word_freq_available():
+        words = set(sorted(words, key=_rarity_key)[:limit])
     return words
 
 
+def _rarity_key(word: str) -> Tuple[float, str]:
+    """The sorting key of a word, the less frequent words come first."""
+    return (get_word_frequency(word) or 0.0, word)
+
+
+# The end of a sentence, including the closing quotes and the spaces after it. The
+# English punctuations must be followed by spaces, so "3.14" is not split.
+_SENTENCE_END = re.compile(r"[.!?]+[\"'”’)\]]*(?:\s+|$)|[。！？]+[”’」』）]*\s*")
+
+
+def split_sentences(text: str) -> List[Tuple[str, str]]:
+    """Split the text into sentences, joining the sentences and separators gives the
+    original text.
+
+    :return: A list of (sentence, the separator after the sentence).
+    """
+    result = []
+    start = 0
+    for m in _SENTENCE_END.finditer(text):
+        result.append(_split_separator(text[start : m.end()]))
+        start = m.end()
+    if start < len(text):
+        result.append(_split_separator(text[start:]))
+    return result
+
+
+def _split_separator(chunk: str) -> Tuple[str, str]:
+    sentence = chunk.rstrip()
+    return sentence, chunk[len(sentence) :]
+
+
 # Easy words that are not considered as candidates when building vocabulary
 easy_words = {
     "is",
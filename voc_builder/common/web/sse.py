@@ -0,0 +1,66 @@
+"""Helpers for streaming text by the SSE protocol."""
+
+import hashlib
+import json
+import time
+from enum import Enum
+from typing import AsyncGenerator, AsyncIterable, Dict, List
+
+
+class StreamMode(str, Enum):
+    """The mode of streaming text to the client.
+
+    - full: Every event contains the full text generated so far.
+    - delta: Every event contains only the new text, and a checksum event of the full
+      text is sent at the end, so the client can verify the text it has joined.
+    """
+
+    FULL = "full"
+    DELTA = "delta"
+
+
+def make_checksum_event(text: str) -> Dict:
+    """Make the checksum event of the full text in delta mode."""
+    checksum = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return {
+        "event": "checksum",
+        "data": json.dumps({"algorithm": "sha256", "value": checksum}),
+    }
+
+
+async def coalesce_text(
+    texts: AsyncIterable[str],
+    delta: bool,
+    flush_interval: float,
+    min_chunk_size: int,
+) -> AsyncGenerator[str, None]:
+    """Batch the streaming text, so that less events are sent when the text is
+    generated in many tiny pieces. The last text is always yielded.
+
+    :param texts: The streaming text, the full text so far or only the new text.
+    :param delta: Whether the texts are only the new text.
+    :param flush_interval: The min interval in seconds between two yields.
+    :param min_chunk_size: The min number of new characters of one yield.
+    """
+    # In delta mode, the buffered new text; in full mode, only the latest text.
+    buffer: List[str] = []
+    pending_size = 0
+    sent_size = 0
+    # The first chunk is sent without waiting
+    last_flushed = float("-inf")
+    async for text in texts:
+        if delta:
+            buffer.append(text)
+            pending_size += len(text)
+        else:
+            buffer = [text]
+            pending_size = len(text) - sent_size
+
+        now = time.monotonic()
+        if pending_size >= min_chunk_size and now - last_flushed >= flush_interval:
+            yield "".join(buffer)
+            buffer, sent_size, pending_size = [], sent_size + pending_size, 0
+            last_flushed = now
+
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,36 @@
+"""The frequencies of English words, provided by the optional "wordfreq" package.
+
+The package is not a dependency of this project, because its data is licensed under
+CC BY-SA 4.0, users who want the frequencies install it themselves.
+"""
+
+import functools
+from typing import Callable, Optional
+
+
+@functools.lru_cache(maxsize=None)
+def _get_frequency_func() -> Optional[Callable[[str, str], float]]:
+    """Get the function for querying the frequencies, None if wordfreq is not installed."""
+    try:
+        from wordfreq import zipf_frequency
+    except ImportError:
+        return None
+    return zipf_frequency
+
+
+def is_word_freq_available() -> bool:
+    """Check if the word frequencies are available."""
+    return _get_frequency_func() is not None
+
+
+def get_word_frequency(word: str) -> Optional[float]:
+    """Get the frequency of the word on the Zipf scale, from 0 (unknown words) to
+    about 8 (the most common words, such as "the").
+
+    :param word: A lower cased word.
+    :return: The frequency, None if the word frequencies are not available.
+    """
+    func = _get_frequency_func()
+    if func is None:
+        return None
+    return func(word, "en")
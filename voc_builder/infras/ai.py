@@ -1,9 +1,14 @@
+import copy
 import logging
+import threading
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.models import create_async_http_client
 from pydantic_ai.models.anthropic import AnthropicModel
 from pydantic_ai.models.google import GoogleModel
 from pydantic_ai.models.openai import OpenAIChatModel
@@ -75,13 +80,45 @@ class WordChoiceModelResp(BaseModel):
         return [d.strip() for d in self.definitions.split("$")]
 
 
+# The max number of agents to cache
+AGENTS_CACHE_SIZE = 32
+# The cached agents, keyed by (model ID, system prompt, output type). The model objects
+# are unhashable, the entry holds a reference to the model so that its ID stays valid.
+_agents: Dict[Tuple[int, str, Any], Tuple[Any, Agent]] = {}
+
+
+def get_agent(model, system_prompt: str = "", output_type: Any = str) -> Agent:
+    """Get an agent for calling the AI model, the agents are reused because building
+    one is expensive, especially when the output schema is involved. The prompts which
+    differ between calls should be passed when running the agent.
+
+    :param model: The AI model object.
+    :param system_prompt: The system prompt, should have only a few distinct values.
+    :param output_type: The type of the output.
+    """
+    key = (id(model), system_prompt, output_type)
+    if cached := _agents.get(key):
+        return cached[1]
+
+    if len(_agents) >= AGENTS_CACHE_SIZE:
+        _agents.clear()
+    agent: Agent = Agent(model, system_prompt=system_prompt, output_type=output_type)
+    _agents[key] = (model, agent)
+    return agent
+
+
+def get_model_id(model) -> str:
+    """Get the ID of the AI model, in the form of "{provider}:{model name}"."""
+    return f"{getattr(model, 'system', '')}:{getattr(model, 'model_name', '')}"
+
+
 def create_ai_model_config() -> AIModelConfig:
     """Create the AI model configuration."""
     settings = get_sys_settings_store().get_system_settings()
     if not settings:
         raise AIModelNotConfiguredError("System settings not found")
 
-    model = create_ai_model(settings)
+    model = get_ai_model(settings)
     if settings.model_provider == "deepseek":
         result_mode = AIResultMode.JSON
     else:
@@ -92,6 +129,58 @@ def create_ai_model_config() -> AIModelConfig:
 # The default base URL for Deepseek API
 DEEPSEEK_DEFAULT_BASE_URL = "https://api.deepseek.com"
 
+# The HTTP client shared by all providers, it keeps the connections to the LLM
+# services alive between requests.
+_http_client: Optional[httpx.AsyncClient] = None
+# The latest created model, in the form of (model config, model object)
+_cached_model: Optional[Tuple[Tuple[str, Any], Any]] = None
+# Guards the creation of the objects above, the AI services might be called from many
+# threads, e.g. the store IO threads. Reentrant because creating a model gets the client.
+_clients_lock = threading.RLock()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the HTTP client shared by all the AI providers."""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = create_async_http_client()
+        return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client, should be called when the server shuts down."""
+    global _http_client, _cached_model
+    with _clients_lock:
+        client, _http_client, _cached_model = _http_client, None, None
+    if client is not None:
+        await client.aclose()
+    _agents.clear()
+
+
+def get_ai_model(settings: SystemSettings):
+    """Get the AI model object, the object is reused until the model config in the
+    settings has been changed.
+
+    :raise AIModelNotConfiguredError: when the model settings is invalid.
+    """
+    global _cached_model
+    # Copy the config, so the key will not be changed by modifying the settings
+    key = (settings.model_provider, copy.copy(_get_provider_config(settings)))
+    with _clients_lock:
+        if _cached_model is None or _cached_model[0] != key:
+            _cached_model = (key, create_ai_model(settings))
+        return _cached_model[1]
+
+
+def _get_provider_config(settings: SystemSettings) -> Any:
+    return {
+        "openai": settings.openai_config,
+        "gemini": settings.gemini_config,
+        "anthropic": settings.anthropic_config,
+        "deepseek": settings.deepseek_config,
+    }.get(settings.model_provider)
+
 
 def create_ai_model(settings: SystemSettings):
     """Create the AI model object for calling with LLM service.
@@ -104,7 +193,9 @@ def create_ai_model(settings: SystemSettings):
         if openai_config.api_host:
             base_url = str(openai_config.api_host).rstrip("/")
         openai_provider = OpenAIProvider(
-            api_key=openai_config.api_key, base_url=base_url
+            api_key=openai_config.api_key,
+            base_url=base_url,
+            http_client=get_http_client(),
         )
         return OpenAIChatModel(openai_config.model, provider=openai_provider)
     elif settings.model_provider == "gemini":
@@ -113,7 +204,9 @@ def create_ai_model(settings: SystemSettings):
         if gemini_config.api_host:
             base_url = str(gemini_config.api_host).rstrip("/")
         gemini_provider = GoogleProvider(
-            api_key=gemini_config.api_key, base_url=base_url
+            api_key=gemini_config.api_key,
+            base_url=base_url,
+            http_client=get_http_client(),
         )
         return GoogleModel(gemini_config.model, provider=gemini_provider)
     elif settings.model_provider == "anthropic":
@@ -123,7 +216,9 @@ def create_ai_model(settings: SystemSettings):
         if anthropic_config.api_host:
             base_url = str(anthropic_config.api_host).rstrip("/")
         anthropic_provider = AnthropicProvider(
-            api_key=anthropic_config.api_key, base_url=base_url
+            api_key=anthropic_config.api_key,
+            base_url=base_url,
+            http_client=get_http_client(),
         )
         return AnthropicModel(anthropic_config.model, provider=anthropic_provider)
     elif settings.model_provider == "deepseek":
@@ -133,7 +228,9 @@ def create_ai_model(settings: SystemSettings):
         if deepseek_config.api_host:
             base_url = str(deepseek_config.api_host).rstrip("/")
         deepseek_provider = OpenAIProvider(
-            api_key=deepseek_config.api_key, base_url=base_url
+            api_key=deepseek_config.api_key,
+            base_url=base_url,
+            http_client=get_http_client(),
         )
         return OpenAIChatModel(deepseek_config.model, provider=deepseek_provider)
     else:
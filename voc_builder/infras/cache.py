@@ -0,0 +1,139 @@
+"""Disk-backed caches for the results of expensive calls, such as querying the AI."""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tinydb.table import Document
+
+from voc_builder.infras.storages import (
+    JSONLogStorage,
+    batch_writes,
+    get_generation,
+    open_db,
+)
+from voc_builder.infras.store import synchronized
+
+
+class LRUCacheStore:
+    """A key-value cache stored in an append-only file, the least recently used items
+    are evicted when the size exceeds the limit. The entries are kept in memory and
+    loaded again when the file has been modified by others.
+
+    Reading an item doesn't write the file, the time it's used is saved together with
+    the next `set()`, or at most once every `save_used_interval` seconds.
+
+    :param file_path: The file path which stores data.
+    :param max_size: The max number of items.
+    :param save_used_interval: The interval of saving the used time of the items read.
+    """
+
+    def __init__(
+        self, file_path: Path, max_size: int = 1000, save_used_interval: float = 60
+    ):
+        self.file_path = file_path
+        self.max_size = max_size
+        self.save_used_interval = save_used_interval
+        self._db = open_db(self.file_path, JSONLogStorage)
+        # The documents keyed by the cache key, ordered from the least recently used
+        self._entries: OrderedDict[str, Document] = OrderedDict()
+        self._entries_generation = -1
+        # The used time of the items read but not saved yet, keyed by the cache key
+        self._unsaved_used: Dict[str, float] = {}
+        self._ts_used_saved = time.time()
+        # The counters of current process
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    @property
+    @synchronized
+    def _index(self) -> OrderedDict[str, Document]:
+        generation = get_generation(self._db)
+        if generation != self._entries_generation:
+            docs = self._db.all()
+            # The items read in current process are more recent than the file says
+            for d in docs:
+                if (ts_used := self._unsaved_used.get(d["key"])) is not None:
+                    d["ts_used"] = max(d["ts_used"], ts_used)
+            docs.sort(key=lambda d: (d["ts_used"], d.doc_id))
+            self._entries = OrderedDict((d["key"], d) for d in docs)
+            self._entries_generation = generation
+        return self._entries
+
+    @synchronized
+    def get(self, key: str) -> Optional[Any]:
+        """Get the value of the given key, return None if not found."""
+        return self.get_many([key])[0]
+
+    @synchronized
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get the values of many keys, the used time of them is saved with one write.
+
+        :return: The values in the order of the keys, None for the keys not found.
+        """
+        index = self._index
+        now = time.time()
+        values: List[Optional[Any]] = []
+        for key in keys:
+            doc = index.get(key)
+            if doc is None:
+                self.misses += 1
+                values.append(None)
+                continue
+
+            self.hits += 1
+            doc["ts_used"] = self._unsaved_used[key] = now
+            index.move_to_end(key)
+            values.append(doc["value"])
+
+        if now - self._ts_used_saved >= self.save_used_interval:
+            with batch_writes(self._db):
+                self._save_used()
+        return values
+
+    @synchronized
+    def set(self, key: str, value: Any):
+        """Set the value of the given key, the value must be JSON serializable."""
+        # The used time of the items read is saved with the same write
+        with batch_writes(self._db):
+            self._unsaved_used.pop(key, None)
+            self._save_used()
+            index = self._index
+            data = {"key": key, "value": value, "ts_used": time.time()}
+            if existing := index.get(key):
+                self._db.update(data, doc_ids=[existing.doc_id])
+                doc_id = existing.doc_id
+            else:
+                doc_id = self._db.insert(data)
+            index[key] = Document(data, doc_id=doc_id)
+            index.move_to_end(key)
+
+            # Evict the least recently used items
+            if len(index) > self.max_size:
+                evicted = [
+                    index.popitem(last=False)[1]
+                    for _ in range(len(index) - self.max_size)
+                ]
+                self._db.remove(doc_ids=[d.doc_id for d in evicted])
+
+    def _save_used(self):
+        """Save the used time of the items read, the items evicted meanwhile are
+        skipped.
+        """
+        # Load the index first, the unsaved time is applied to it if loaded again
+        index = self._index
+        unsaved, self._unsaved_used = self._unsaved_used, {}
+        self._ts_used_saved = time.time()
+        for key, ts_used in unsaved.items():
+            if doc := index.get(key):
+                self._db.update({"ts_used": ts_used}, doc_ids=[doc.doc_id])
+
+    @synchronized
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics of the cache, the hits and misses are counted in current
+        process only.
+        """
+        return {"size": len(self._index), "hits": self.hits, "misses": self.misses}
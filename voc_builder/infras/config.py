@@ -10,3 +10,33 @@ data_dir = Path(os.environ.get("AIVOC_DATA_DIR", "~")).expanduser()
 DEFAULT_CSV_FILE_PATH = data_dir / "aivoc_builder.csv"
 # The default path for storing db files
 DEFAULT_DB_PATH = data_dir / ".aivoc_db"
+
+# The storage backend of databases, available values:
+#
+# - "json": the default backend, every database is a JSON file.
+# - "jsonl": the vocabulary book and mastered words are stored in append-only JSON
+#   lines files, recommended for large vocabulary books.
+# - "sqlite": all the data is stored in a SQLite database, recommended for very large
+#   vocabulary books, use "aivoc db migrate" to migrate the existing data.
+DB_BACKEND = os.environ.get("AIVOC_DB_BACKEND", "json")
+
+# The partial text of the SSE streams is batched before being sent to the client, a
+# chunk is sent only after the interval (in seconds) since the last one has passed,
+# and it has at least the given number of new characters. The final text is always
+# sent without waiting.
+SSE_FLUSH_INTERVAL = float(os.environ.get("AIVOC_SSE_FLUSH_INTERVAL", "0.1"))
+SSE_MIN_CHUNK_SIZE = int(os.environ.get("AIVOC_SSE_MIN_CHUNK_SIZE", "16"))
+
+# The max number of word definitions returned by the AI to be cached, the same word in
+# the same paragraph will be returned from the cache without calling the AI again.
+WORD_DEF_CACHE_SIZE = int(os.environ.get("AIVOC_WORD_DEF_CACHE_SIZE", "2000"))
+
+# The max number of translated sentences to be kept in the translation memory, only the
+# sentences not translated before will be sent to the AI.
+TRANSLATION_MEMORY_SIZE = int(os.environ.get("AIVOC_TRANSLATION_MEMORY_SIZE", "20000"))
+
+# The max number of candidate words sent to the AI for choosing the rare word, only the
+# least frequent words are kept, requires the optional "wordfreq" package.
+RARE_WORD_CANDIDATES_LIMIT = int(
+    os.environ.get("AIVOC_RARE_WORD_CANDIDATES_LIMIT", "12")
+)
@@ -0,0 +1,29 @@
+"""The converter for turning the data in databases into objects and vice versa.
+
+The data in databases is always written by ourselves, so the detailed validation
+is turned off, and the hooks of the classes on the hot path are generated at import
+time instead of on the first use.
+"""
+
+from typing import Type
+
+import cattrs
+from cattrs.gen import make_dict_structure_fn, make_dict_unstructure_fn
+
+from voc_builder.builder.models import WordDefinition, WordProgress, WordSample
+
+converter = cattrs.Converter(detailed_validation=False)
+
+
+def register_hooks(*classes: Type):
+    """Generate and register the structure and unstructure hooks of the given
+    dataclasses, the classes of their fields must have been registered first.
+    """
+    for cls in classes:
+        converter.register_structure_hook(cls, make_dict_structure_fn(cls, converter))
+        converter.register_unstructure_hook(
+            cls, make_dict_unstructure_fn(cls, converter)
+        )
+
+
+register_hooks(WordDefinition, WordSample, WordProgress)
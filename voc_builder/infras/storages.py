@@ -0,0 +1,657 @@
+"""Customized storages for TinyDB databases"""
+
+import contextlib
+import json
+import logging
+import os
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from tinydb import TinyDB
+from tinydb.storages import JSONStorage, Storage, touch
+from tinydb.table import Table
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# The signature of a file, made of the modified time(in ns) and the size.
+FileSignature = Tuple[int, int]
+
+
+class CachedJSONStorage(JSONStorage):
+    """A JSON storage which keeps the parsed data in memory, the file is only parsed
+    again when it has been modified by others(e.g. another server worker), which is
+    detected by the modified time and the size of the file.
+    """
+
+    def __init__(self, path: str, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Dict[str, Any]]] = None
+        self._signature: Optional[FileSignature] = None
+        # Increased every time the data is loaded from the file
+        self.generation = 0
+        # The nesting depth of `batch()`, and the data waiting to be written
+        self._batch_depth = 0
+        self._pending: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def sync(self) -> int:
+        """Load the data again if the file has been modified since the last read or write.
+
+        :return: The generation of the current data.
+        """
+        with self._lock:
+            if self._batch_depth:
+                return self.generation
+            signature = self._get_signature()
+            if signature != self._signature:
+                self._data = super().read()
+                self._signature = signature
+                self.generation += 1
+            return self.generation
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            self.sync()
+            return self._data
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            if self._batch_depth:
+                self._data = self._pending = data
+                return
+            try:
+                super().write(data)
+            except Exception:
+                # The data in memory might be out of sync with the file, drop it
+                self._signature = None
+                raise
+            self._data = data
+            self._signature = self._get_signature()
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Merge the writes made in the block into one write of the file, the file is
+        not loaded again until the block exits. Other threads are blocked meanwhile.
+        """
+        with self._lock:
+            self.sync()
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                # The data in memory has been changed partially, load it again
+                self._pending, self._signature = None, None
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth and self._pending is not None:
+                data, self._pending = self._pending, None
+                self.write(data)
+
+    def _get_signature(self) -> FileSignature:
+        st = os.fstat(self._handle.fileno())
+        return (st.st_mtime_ns, st.st_size)
+
+
+class JSONLogStorage(Storage):
+    """An append-only storage, every change of a document is appended to the file as a
+    JSON line, the data is restored by replaying the lines. Compared to `JSONStorage`,
+    the cost of a write no longer grows with the size of the database. Once the log
+    has grown too long, it will be compacted in a background thread.
+
+    The file might be shared by many processes, the changes are made with an exclusive
+    lock of the "<name>.lock" file held, see `locked()`. Every time the file is
+    rewritten, it starts with a header line of a new random epoch, so others know the
+    lines they have replayed are gone, even if the new file has the same inode.
+
+    Should be used together with the `JSONLogTable` table.
+
+    :param path: Where to store the log.
+    :param compact_threshold: The log is compacted when it has more lines than this
+        value and is at least twice as long as the number of documents.
+    """
+
+    default_compact_threshold = 1000
+
+    def __init__(self, path: str, compact_threshold: Optional[int] = None, **kwargs):
+        super().__init__()
+        touch(path, create_dirs=False)
+        self.path = Path(path)
+        self.lock_path = get_lock_path(self.path)
+        self.compact_threshold = compact_threshold or self.default_compact_threshold
+        self.lock = threading.RLock()
+        self._file_locked = False
+        self.generation = 0
+
+        self._data: Dict[str, Dict[str, Any]] = {}
+        # The position of the file which has been replayed, `None` means the data
+        # must be loaded from the beginning.
+        self._offset: Optional[int] = None
+        self._epoch: Optional[str] = None
+        # The device, inode, modified time(in ns) and size of the file when last synced
+        self._stat: Optional[Tuple[int, int, int, int]] = None
+        self._lines_cnt = 0
+        self._compacting = False
+        # The nesting depth of `batch()`, and the lines waiting to be appended
+        self._batch_depth = 0
+        self._pending_lines: List[str] = []
+
+    def sync(self) -> int:
+        """Replay the lines appended by others since the last read or write.
+
+        :return: The generation of the current data.
+        """
+        with self.lock:
+            if self._batch_depth:
+                return self.generation
+            st = self.path.stat()
+            stat = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+            if self._offset is not None and stat == self._stat:
+                return self.generation
+
+            self._stat = stat
+            if not self._replay():
+                return self.generation
+            self.generation += 1
+            return self.generation
+
+    def read(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self.lock:
+            self.sync()
+            return self._data
+
+    def get_raw_table(self, name: str) -> Dict[str, Any]:
+        """Get the raw data of a table, changes made to it must be appended later."""
+        with self.lock:
+            self.sync()
+            return self._data.setdefault(name, {})
+
+    def write(self, data: Dict[str, Dict[str, Any]]):
+        """Replace the whole data, the file will be rewritten."""
+        with self.locked():
+            self._data = data
+            # The pending changes are included in the data
+            self._pending_lines = []
+            self._rewrite(self._dump_lines(data))
+
+    def append(self, table: str, updated: Dict[str, Dict], removed: List[str]):
+        """Append the changes of a table to the log, the changes must have been
+        applied to the data returned by `read()` already.
+
+        :param table: The name of the table.
+        :param updated: The documents which have been inserted or updated, by doc ID.
+        :param removed: The IDs of the removed documents.
+        """
+        lines = [_dump_line(table, doc_id, doc) for doc_id, doc in updated.items()]
+        lines.extend(_dump_line(table, doc_id, None) for doc_id in removed)
+        if not lines:
+            return
+
+        with self.lock:
+            if self._batch_depth:
+                self._pending_lines.extend(lines)
+                return
+            self._flush_lines(lines)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator[None]:
+        """Merge the changes made in the block into one append to the file, the lines
+        appended by others are not replayed until the block exits. Other threads and
+        processes are blocked meanwhile.
+        """
+        with self.locked():
+            self.sync()
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                # The data in memory has been changed partially, load it again
+                self._pending_lines, self._offset = [], None
+                raise
+            finally:
+                self._batch_depth -= 1
+            if not self._batch_depth and self._pending_lines:
+                lines, self._pending_lines = self._pending_lines, []
+                self._flush_lines(lines)
+
+    def _flush_lines(self, lines: List[str]):
+        """Append the lines to the file, and start compacting it if needed."""
+        with self.lock:
+            try:
+                self._append_lines(lines)
+            except Exception:
+                # The data in memory is ahead of the file, load it again next time
+                self._offset = None
+                raise
+
+            if self._should_compact():
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def compact(self) -> bool:
+        """Rewrite the log so that every document only has one line.
+
+        :return: Whether the log has been compacted, it might be given up when the file
+            has been modified by others during the process.
+        """
+        with self.lock:
+            generation, offset = self.sync(), self._offset
+            # The tables only update the top level fields of documents, shallow copies
+            # are enough for taking a snapshot.
+            snapshot = {
+                name: {doc_id: dict(doc) for doc_id, doc in docs.items()}
+                for name, docs in self._data.items()
+            }
+
+        # Serializing the data is the slow part, do it without holding the lock
+        content = "".join(self._dump_lines(snapshot))
+
+        with self.locked():
+            # Check again with the file locked, others can't append lines meanwhile
+            if self.sync() != generation or self._offset != offset:
+                return False
+            self._rewrite([content])
+            return True
+
+    def close(self):
+        pass
+
+    @contextlib.contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the lock of the file which is shared by all processes, together with
+        the lock of current thread, it can be nested.
+        """
+        with self.lock:
+            if self._file_locked:
+                yield
+                return
+
+            with _lock_file(self.lock_path):
+                self._file_locked = True
+                try:
+                    yield
+                finally:
+                    self._file_locked = False
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception("Error compacting the log file %s.", self.path)
+        finally:
+            self._compacting = False
+
+    def _should_compact(self) -> bool:
+        if self._compacting or self._lines_cnt <= self.compact_threshold:
+            return False
+        docs_cnt = sum(len(docs) for docs in self._data.values())
+        return self._lines_cnt > docs_cnt * 2
+
+    def _replay(self) -> bool:
+        """Apply the complete lines after the current offset, all lines are applied
+        again if the file has been rewritten by others.
+
+        :return: Whether the data has been changed.
+        """
+        with open(self.path, "rb") as fp:
+            epoch = _read_epoch(fp)
+            if self._offset is None or epoch != self._epoch:
+                self._data, self._offset, self._lines_cnt = {}, 0, 0
+                self._epoch = epoch
+            elif fp.seek(0, os.SEEK_END) == self._offset:
+                return False
+            fp.seek(self._offset)
+            content = fp.read()
+
+        # Ignore the last line if it's incomplete, it might be in progress
+        end = content.rfind(b"\n") + 1
+        for raw_line in content[:end].splitlines():
+            if not raw_line.strip():
+                continue
+            try:
+                line = json.loads(raw_line)
+            except ValueError:
+                logger.warning("Skipped a malformed line in %s.", self.path)
+                continue
+
+            if "epoch" in line:
+                continue
+            self._lines_cnt += 1
+            docs = self._data.setdefault(line["table"], {})
+            if line["doc"] is None:
+                docs.pop(line["id"], None)
+            else:
+                docs[line["id"]] = line["doc"]
+        self._offset += end
+        return True
+
+    def _append_lines(self, lines: List[str]):
+        content = "".join(lines).encode("utf-8")
+        epoch = None
+        # Open the file after locking it, it might have been replaced by a compaction
+        with self.locked(), open(self.path, "ab+") as fp:
+            end = fp.seek(0, os.SEEK_END)
+            # The last line might be incomplete because of a crash, end it first
+            if end:
+                fp.seek(end - 1)
+                if fp.read(1) != b"\n":
+                    content = b"\n" + content
+            else:
+                # A new file starts with the header line
+                epoch = _new_epoch()
+                content = _dump_epoch(epoch).encode("utf-8") + content
+            fp.write(content)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        if end == self._offset:
+            self._offset = end + len(content)
+            self._lines_cnt += len(lines)
+            if epoch:
+                self._epoch = epoch
+        else:
+            # Others have appended lines before ours, replay all of them, the
+            # result is the same as replaying in the order of the file.
+            self.sync()
+
+    def _rewrite(self, lines: List[str]):
+        """Replace the file with the given lines, the data in memory must be consistent
+        with the lines.
+        """
+        epoch = _new_epoch()
+        _replace_file(self.path, [_dump_epoch(epoch), *lines])
+        st = self.path.stat()
+        self._epoch, self._offset = epoch, st.st_size
+        self._stat = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        self._lines_cnt = sum(len(docs) for docs in self._data.values())
+
+    @staticmethod
+    def _dump_lines(data: Dict[str, Dict[str, Any]]) -> List[str]:
+        return [
+            _dump_line(table, doc_id, doc)
+            for table, docs in data.items()
+            for doc_id, doc in docs.items()
+        ]
+
+
+def import_json_db(json_path: Path, log_path: Path) -> bool:
+    """Import the data of a `JSONStorage` file into a new `JSONLogStorage` file, so the
+    data is kept after switching the storage. Nothing is done if the log file exists.
+
+    :return: Whether the data has been imported.
+    """
+    if log_path.exists() or not json_path.exists():
+        return False
+
+    with _lock_file(get_lock_path(log_path)):
+        # Others might have imported it while waiting for the lock
+        if log_path.exists():
+            return False
+        data = json.loads(json_path.read_text(encoding="utf-8") or "{}")
+        lines = [_dump_epoch(_new_epoch()), *JSONLogStorage._dump_lines(data)]
+        _replace_file(log_path, lines)
+    logger.info("Imported the data of %s into %s.", json_path, log_path)
+    return True
+
+
+def get_lock_path(path: Path) -> Path:
+    """Get the path of the file for locking the given file across processes."""
+    return path.with_name(path.name + ".lock")
+
+
+def _replace_file(path: Path, lines: List[str]):
+    """Replace the file with the given lines atomically, by writing them into a
+    temporary file in the same directory first.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=path.name + ".", suffix=".tmp", dir=path.parent
+    )
+    try:
+        with open(fd, "w", encoding="utf-8") as fp:
+            fp.writelines(lines)
+            fp.flush()
+            os.fsync(fp.fileno())
+        # The temporary file is only readable by the owner, keep the mode
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+@contextlib.contextmanager
+def _lock_file(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock of the file, it's shared by all processes. Block until
+    the lock is acquired, the file is created if it doesn't exist.
+    """
+    with open(path, "ab") as fp:
+        if sys.platform == "win32":
+            # Lock the first byte, it's allowed to be beyond the end of the file
+            fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # `LK_LOCK` gives up after 10 seconds
+                    continue
+            try:
+                yield
+            finally:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def _dump_line(table: str, doc_id: str, doc: Optional[Dict]) -> str:
+    """Dump a change as a line, `doc` is None means the document was removed."""
+    return json.dumps({"table": table, "id": doc_id, "doc": doc}) + "\n"
+
+
+def _new_epoch() -> str:
+    return secrets.token_hex(8)
+
+
+def _dump_epoch(epoch: str) -> str:
+    """Dump the header line of a log file, see `JSONLogStorage`."""
+    return json.dumps({"epoch": epoch}) + "\n"
+
+
+def _read_epoch(fp: BinaryIO) -> Optional[str]:
+    """Read the epoch from the header line of a log file, None if there isn't one."""
+    fp.seek(0)
+    raw_line = fp.readline()
+    if not raw_line.endswith(b"\n"):
+        return None
+    try:
+        line = json.loads(raw_line)
+    except ValueError:
+        return None
+    return line.get("epoch") if isinstance(line, dict) else None
+
+
+class SharedTable(Table):
+    """A table for databases which might be modified by other processes at any time,
+    query results are never cached.
+    """
+
+    default_query_cache_capacity = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._id_generation = 0
+
+    def _get_next_id(self):
+        # Documents might have been inserted by others, find out the next ID again
+        generation = sync_storage(self._storage)
+        if generation != self._id_generation:
+            self._next_id = None
+            self._id_generation = generation
+        return super()._get_next_id()
+
+
+class JSONLogTable(SharedTable):
+    """A table for `JSONLogStorage`, only the changed documents are written. The file
+    is locked during the changes, so the documents and IDs are always up to date.
+    """
+
+    def insert(self, document):
+        with self._log_storage.locked():
+            return super().insert(document)
+
+    def insert_multiple(self, documents):
+        with self._log_storage.locked():
+            return super().insert_multiple(documents)
+
+    @property
+    def _log_storage(self) -> JSONLogStorage:
+        storage = self._storage
+        assert isinstance(storage, JSONLogStorage)
+        return storage
+
+    def _update_table(self, updater):
+        storage = self._log_storage
+        with storage.locked():
+            raw_table = storage.get_raw_table(self.name)
+            view = _TrackedTableView(raw_table, self.document_id_class)
+            updater(view)
+            updated, removed = view.get_changes()
+            storage.append(self.name, updated, removed)
+        self.clear_cache()
+
+
+class _TrackedTableView(MutableMapping):
+    """A view of the raw table data, keyed by the document ID class, it tracks all the
+    documents modified through it.
+
+    The documents are modified in place, like TinyDB does when updating documents.
+    Only the top level fields are compared when checking if a document has been
+    changed.
+    """
+
+    def __init__(self, raw_table: Dict[str, Dict], id_class: Type):
+        self._raw = raw_table
+        self._id_class = id_class
+        self._set_ids: set = set()
+        self._removed_ids: set = set()
+        # The snapshots of documents before they were accessed
+        self._snapshots: Dict[str, Dict] = {}
+
+    def __getitem__(self, doc_id) -> Dict:
+        key = str(doc_id)
+        doc = self._raw[key]
+        if key not in self._snapshots and key not in self._set_ids:
+            self._snapshots[key] = dict(doc)
+        return doc
+
+    def __setitem__(self, doc_id, doc: Dict):
+        key = str(doc_id)
+        self._raw[key] = doc
+        self._set_ids.add(key)
+        self._removed_ids.discard(key)
+
+    def __delitem__(self, doc_id):
+        key = str(doc_id)
+        del self._raw[key]
+        self._set_ids.discard(key)
+        self._removed_ids.add(key)
+
+    def __iter__(self) -> Iterator:
+        return (self._id_class(key) for key in self._raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __contains__(self, doc_id) -> bool:
+        return str(doc_id) in self._raw
+
+    def get_changes(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """Get the changed documents.
+
+        :return: A tuple of (updated documents by ID, removed IDs).
+        """
+        updated = {key: self._raw[key] for key in self._set_ids}
+        for key, snapshot in self._snapshots.items():
+            doc = self._raw.get(key)
+            if doc is not None and doc != snapshot:
+                updated[key] = doc
+        return updated, list(self._removed_ids)
+
+
+class SharedTinyDB(TinyDB):
+    """A long-lived TinyDB database, its file may be shared with other processes."""
+
+    table_class = SharedTable
+
+
+class JSONLogTinyDB(TinyDB):
+    """A long-lived TinyDB database which uses `JSONLogStorage`."""
+
+    table_class = JSONLogTable
+
+
+def open_db(file_path: Path, storage: Type[Storage] = CachedJSONStorage) -> TinyDB:
+    """Open a database which can be kept for a long time.
+
+    :param file_path: The path of the data file.
+    :param storage: The storage type.
+    """
+    if issubclass(storage, JSONLogStorage):
+        return JSONLogTinyDB(file_path, storage=storage)
+    return SharedTinyDB(file_path, storage=storage)
+
+
+def sync_storage(storage: Storage) -> int:
+    """Load the modifications made by others into the storage.
+
+    :return: The generation of the data, it changes whenever the data has been loaded
+        again from the file.
+    """
+    if isinstance(storage, (CachedJSONStorage, JSONLogStorage)):
+        return storage.sync()
+    return 0
+
+
+def get_generation(db: TinyDB) -> int:
+    """Get the generation of the data in the given database, see `sync_storage`."""
+    return sync_storage(db.storage)
+
+
+@contextlib.contextmanager
+def batch_writes(db: TinyDB) -> Iterator[None]:
+    """Merge the writes made to the database in the block into one write of the file,
+    the writes are made one by one if the storage doesn't support it.
+    """
+    storage = db.storage
+    if isinstance(storage, (CachedJSONStorage, JSONLogStorage)):
+        with storage.batch():
+            yield
+    else:
+        yield
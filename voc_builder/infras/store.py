@@ -1,70 +1,229 @@
+import asyncio
+import bisect
 import copy
 import datetime
+import functools
+import hashlib
+import heapq
+import json
 import math
+import os
 import random
+import shutil
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set
+from typing import (
+    Any,
+    Callable,
+    Concatenate,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    ParamSpec,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 import cattrs
-from tinydb import Query, TinyDB
+from tinydb import Query
+from tinydb.storages import Storage
+from tinydb.table import Document
 
 from voc_builder.builder.models import WordProgress, WordSample
 from voc_builder.infras import config
+from voc_builder.infras.converter import converter, register_hooks
+from voc_builder.infras.storages import (
+    CachedJSONStorage,
+    JSONLogStorage,
+    batch_writes,
+    get_generation,
+    import_json_db,
+    open_db,
+)
 from voc_builder.system.models import SystemSettings
 
+# The table which stores the metadata of a database, such as the schema version
+META_TABLE_NAME = "_meta"
 
-class MasteredWordStore:
-    """Stores words the user has already mastered
+# The table which stores the paragraphs referenced by words, see `split_paragraph`
+PARAGRAPHS_TABLE_NAME = "paragraphs"
+
+# The version of the schema of word documents, increase it when the documents need
+# to be upgraded, see `WordStore._upgrade_schema`.
+#
+# - 1: the legacy fields were upgraded, see `upgrade_word_doc`.
+# - 2: the paragraphs were moved out of the word documents.
+# - 3: the progresses were moved into a separate file, see `get_progress_file_path`.
+WORD_SCHEMA_VERSION = 3
+
+# The fields of word samples which are often shared by many words
+SHARED_WS_FIELDS = ("orig_text", "translated_text", "paragraph_id")
+
+# Used when the paragraph referenced by a word is missing
+EMPTY_PARAGRAPH = {"orig_text": "", "translated_text": ""}
+
+# An entry of the date index: (date added, document ID, word), words added at the same
+# time are ordered by the document ID.
+DateIndexEntry = Tuple[float, int, str]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def synchronized(
+    method: Callable[Concatenate[Any, P], R],
+) -> Callable[Concatenate[Any, P], R]:
+    """Run the method of a store with the store's `_lock` held, the stores are shared
+    by the threads which serve the requests, see `run_store_io`.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: P.args, **kwargs: P.kwargs) -> R:
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class BaseMasteredWordStore:
+    """The base class of stores which store the mastered words."""
+
+    def filter(self, words: Set[str]) -> Set[str]:
+        """Filter the given word list, return those exists in current store."""
+        raise NotImplementedError
+
+    def all(self) -> List[str]:
+        """Return all mastered words."""
+        raise NotImplementedError
+
+    def add(self, word: str):
+        """Mark a word as mastered."""
+        raise NotImplementedError
+
+    def add_many(self, words: List[str]):
+        """Mark many words as mastered at once."""
+        raise NotImplementedError
+
+    def remove(self, word: str):
+        """Remove a word."""
+        raise NotImplementedError
+
+    def remove_many(self, words: List[str]):
+        """Remove many words at once."""
+        raise NotImplementedError
+
+    def exists(self, word: str) -> bool:
+        """Check if a word exists in current store."""
+        raise NotImplementedError
+
+
+class MasteredWordStore(BaseMasteredWordStore):
+    """Stores words the user has already mastered, the words are kept in memory as an
+    immutable snapshot, which is replaced on every write and loaded again when the file
+    has been modified by others.
 
     :param file_path: the file path which stores data
+    :param storage: the storage type of the database
     """
 
-    def __init__(self, file_path: Path):
+    def __init__(self, file_path: Path, storage: Type[Storage] = CachedJSONStorage):
         self.file_path = file_path
-        self._db = TinyDB(self.file_path)
+        self._db = open_db(self.file_path, storage)
+        # The words in the order of being added, and the set of them for lookups
+        self._ordered_words: Tuple[str, ...] = ()
+        self._word_set: FrozenSet[str] = frozenset()
+        self._snapshot_generation = -1
+        self._lock = threading.RLock()
+
+    @property
+    def _words(self) -> FrozenSet[str]:
+        """The snapshot of all mastered words."""
+        self._sync_snapshot()
+        return self._word_set
+
+    @synchronized
+    def _sync_snapshot(self):
+        generation = get_generation(self._db)
+        if generation != self._snapshot_generation:
+            self._set_snapshot(d["word"] for d in self._db.all())
+            self._snapshot_generation = generation
+
+    def _set_snapshot(self, words: Iterable[str]):
+        self._ordered_words = tuple(words)
+        self._word_set = frozenset(self._ordered_words)
 
     def filter(self, words: Set[str]) -> Set[str]:
         """Filter the given word list, return those exists in current db
 
         :param words: a list of lower cased word.
         """
-        return {word for word in words if self.exists(word)}
+        return words & self._words
 
+    @synchronized
     def all(self) -> List[str]:
         """Return all mastered words
 
         :return: List of words.
         """
-        return [d["word"] for d in self._db.all()]
+        self._sync_snapshot()
+        return list(self._ordered_words)
 
     def add(self, word: str):
         """Mark a word as mastered
 
         :param word: Lower cased word.
         """
-        MWord = Query()
-        return self._db.upsert({"word": word}, MWord.word == word)
+        self.add_many([word])
+
+    @synchronized
+    def add_many(self, words: List[str]):
+        """Mark many words as mastered, the file is only written once.
+
+        :param words: Lower cased words.
+        """
+        existing = self._words
+        new_words = [w for w in dict.fromkeys(words) if w not in existing]
+        if new_words:
+            self._db.insert_multiple({"word": w} for w in new_words)
+            self._set_snapshot(self._ordered_words + tuple(new_words))
 
     def remove(self, word: str):
         """Remove a word
 
         :param word: Lower cased word.
         """
+        self.remove_many([word])
+
+    @synchronized
+    def remove_many(self, words: List[str]):
+        """Remove many words, the file is only written once.
+
+        :param words: Lower cased words.
+        """
+        targets = self._words.intersection(words)
+        if not targets:
+            return
         MWord = Query()
-        self._db.remove(MWord.word == word)
+        self._db.remove(MWord.word.one_of(targets))
+        self._set_snapshot(w for w in self._ordered_words if w not in targets)
 
     def exists(self, word: str):
         """Check if a word exists in current db
 
         :param word: Lower cased word.
         """
-        MWord = Query()
-        return bool(self._db.search(MWord.word == word))
+        return word in self._words
 
 
-@dataclass
+@dataclass(slots=True)
 class WordDetailedObj:
     """A detailed word object, including the WordSample, WordProgress and other data."""
 
@@ -85,70 +244,44 @@ class WordDetailedObj:
         )
 
 
-class WordStore:
-    """Stores all the words in vocabulary book
+register_hooks(WordDetailedObj)
 
-    :param file_path: the file path which stores data
-    """
 
-    def __init__(self, file_path: Path):
-        self.file_path = file_path
-        self._db = TinyDB(self.file_path)
+class BaseWordStore:
+    """The base class of stores which store all the words in vocabulary book."""
 
     def pick_quiz_words(self, count: int) -> List[WordSample]:
-        """Pick some words for generating quiz.
-
-        :param count: How many words to pick
-        :return: A list of words
-        """
-        all_words = sorted(
-            self.all(),
-            key=lambda obj: (obj.wp.ts_date_quiz or 0, obj.ts_date_added or 0),
-        )
-        # Randomize the result by picking from a slightly lager range
-        results = all_words[: math.ceil(1.5 * count)]
-        random.shuffle(results)
-        return [obj.ws for obj in results][:count]
+        """Pick some words for generating quiz."""
+        raise NotImplementedError
 
     def update_quiz_words(self, words: List[WordSample]):
         """Update the words being used for making quiz, so later picking won't get the
         identical results over and over again.
         """
-        Word = Query()
+        now = time.time()
+        progresses = []
         for w in words:
             obj = self.get(w.word)
             if not obj:
                 continue
 
-            # Increase the count being storied and update date
+            # Increase the count being used for quiz and update date
             wp = copy.copy(obj.wp)
             wp.quiz_cnt += 1
-            wp.ts_date_quiz = time.time()
-            self._db.update(
-                {"wp": asdict(wp)},
-                Word.ws.word == obj.ws.word,
-            )
+            wp.ts_date_quiz = now
+            progresses.append(wp)
+        self.update_progresses(progresses)
 
     def pick_story_words(self, count: int = 6) -> List[WordSample]:
-        """Pick some words for writing story
-
-        :param count: How many words to pick
-        :return: A list of words
-        """
-        all_words = sorted(
-            self.all(),
-            key=lambda obj: (obj.wp.ts_date_storied or 0, obj.ts_date_added or 0),
-        )
-        # Randomize the result by picking from a slightly lager range
-        results = all_words[: math.ceil(1.5 * count)]
-        random.shuffle(results)
-        return [obj.ws for obj in results][:count]
+        """Pick some words for writing story."""
+        raise NotImplementedError
 
     def update_story_words(self, words: List[WordSample]):
         """Update the words being used for making story, so later picking won't get the
         identical results over and over again.
         """
-        Word = Query()
+        now = time.time()
+        progresses = []
         for w in words:
             obj = self.get(w.word)
             if not obj:
@@ -157,24 +290,310 @@ class WordStore:
             # Increase the count being storied and update date
             wp = copy.copy(obj.wp)
             wp.storied_cnt += 1
-            wp.ts_date_storied = time.time()
-            self._db.update(
-                {"wp": asdict(wp)},
-                Word.ws.word == obj.ws.word,
-            )
+            wp.ts_date_storied = now
+            progresses.append(wp)
+        self.update_progresses(progresses)
+
+    def update_progresses(self, progresses: List[WordProgress]):
+        """Update the progresses of many words at once."""
+        raise NotImplementedError
+
+    def list_latest(self, limit: Optional[int] = None) -> List[WordDetailedObj]:
+        """List latest added words, ordered by date added."""
+        raise NotImplementedError
+
+    def list_by_date_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> List[WordDetailedObj]:
+        """List words added between the given dates, both are inclusive."""
+        raise NotImplementedError
+
+    def filter(self, words: Set[str]) -> Set[str]:
+        """Filter the given word list, return those exists in current store."""
+        raise NotImplementedError
+
+    def add(self, word: WordSample, ts_date_added: Optional[float] = None):
+        """Add a word to the vocabulary book."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """The count of all words in store."""
+        raise NotImplementedError
+
+    def get(self, word: str) -> Optional[WordDetailedObj]:
+        """Get a result by word string, return None if no word can be found."""
+        raise NotImplementedError
+
+    def all(self) -> Iterable[WordDetailedObj]:
+        """Return all words and progresses objects."""
+        raise NotImplementedError
+
+    def search(
+        self, keyword: str, order_by: str = "date_added"
+    ) -> Iterable[WordDetailedObj]:
+        """Search for words by keyword."""
+        raise NotImplementedError
+
+    def remove(self, word: str):
+        """Remove a word."""
+        raise NotImplementedError
+
+    def remove_many(self, words: List[str]):
+        """Remove many words at once."""
+        raise NotImplementedError
+
+    def exists(self, word: str) -> bool:
+        """Check if a word exists in current store."""
+        raise NotImplementedError
+
+
+class WordStore(BaseWordStore):
+    """Stores all the words in vocabulary book. The learning progresses of words change
+    much more often than the words, they are stored in a separate append-only file, so
+    that updating them doesn't rewrite the words.
+
+    :param file_path: the file path which stores data
+    :param storage: the storage type of the database
+    """
+
+    def __init__(self, file_path: Path, storage: Type[Storage] = CachedJSONStorage):
+        self.file_path = file_path
+        self._db = open_db(self.file_path, storage)
+        self._progress_db = open_db(get_progress_file_path(file_path), JSONLogStorage)
+        # The indexes are built on the first access, and built again when the file
+        # has been modified by others.
+        self._word_index: Dict[str, Document] = {}
+        self._dates: List[DateIndexEntry] = []
+        # The paragraphs by ID, and how many words are referencing each of them
+        self._paragraphs: Dict[str, Document] = {}
+        self._paragraph_refs: Counter[str] = Counter()
+        # The shared copies of the strings, dropped together with the indexes
+        self._strings: Dict[str, str] = {}
+        self._index_generation = -1
+        # The progress data by word, words without progress data are never used
+        self._progress_index: Dict[str, Document] = {}
+        self._progress_generation = -1
+        self._lock = threading.RLock()
+        self._upgrade_schema()
+
+    @property
+    def _index(self) -> Dict[str, Document]:
+        """The in-memory index of all documents, keyed by the word string."""
+        self._sync_indexes()
+        return self._word_index
+
+    @property
+    def _date_index(self) -> List[DateIndexEntry]:
+        """The index of all words, sorted by date added."""
+        self._sync_indexes()
+        return self._dates
+
+    @property
+    @synchronized
+    def _progresses(self) -> Dict[str, Document]:
+        """The index of all progress data, keyed by the word string."""
+        generation = get_generation(self._progress_db)
+        if generation != self._progress_generation:
+            self._progress_index = {d["word"]: d for d in self._progress_db.all()}
+            self._progress_generation = generation
+        return self._progress_index
+
+    @synchronized
+    def _sync_indexes(self):
+        generation = get_generation(self._db)
+        if generation == self._index_generation:
+            return
+
+        docs = self._db.all()
+        strings: Dict[str, str] = {}
+        for d in docs:
+            compact_word_doc(d, strings)
+        self._strings = strings
+        self._word_index = {d["ws"]["word"]: d for d in docs}
+        self._dates = sorted(_to_date_index_entry(d) for d in docs)
+        self._paragraphs = {
+            d["id"]: d for d in self._db.table(PARAGRAPHS_TABLE_NAME).all()
+        }
+        self._paragraph_refs = Counter(
+            pid for d in docs if (pid := d["ws"].get("paragraph_id"))
+        )
+        self._index_generation = generation
+
+    @synchronized
+    def _upgrade_schema(self):
+        """Upgrade the documents in legacy formats, it only does the work once for
+        every file, so the documents can be read without any compatibility handling.
+        """
+        meta = self._db.table(META_TABLE_NAME)
+        meta_doc = meta.get(doc_id=1)
+        version = meta_doc["schema_version"] if meta_doc else 0
+        if version >= WORD_SCHEMA_VERSION:
+            return
+
+        docs = self._db.all()
+        upgraded: Dict[str, Dict] = {}
+        paragraphs = []
+        progresses = {}
+        for doc in docs:
+            ws = upgrade_word_doc(doc["ws"]) or doc["ws"]
+            ws, paragraph = split_paragraph(ws)
+            if paragraph:
+                paragraphs.append(paragraph)
+            if ws is not doc["ws"] or "wp" in doc:
+                upgraded[ws["word"]] = ws
+            # Words in the initial state don't need the progress data
+            wp = doc.get("wp")
+            if wp and wp != asdict(WordProgress(word=ws["word"])):
+                progresses[ws["word"]] = wp
+
+        # All the changes of the word file are made with one write
+        with batch_writes(self._db):
+            if upgraded:
+                # Save the data moved out before the words which are referencing them
+                self._save_paragraphs(paragraphs)
+                self._save_progresses(progresses)
+
+                def _update(doc):
+                    doc["ws"] = upgraded[doc["ws"]["word"]]
+                    doc.pop("wp", None)
+
+                doc_ids = [d.doc_id for d in docs if d["ws"]["word"] in upgraded]
+                self._db.update(_update, doc_ids=doc_ids)
+                # The documents in the indexes are out of date
+                self._index_generation = -1
+            # A new file is always in the latest schema, no need to record it
+            if docs:
+                meta.upsert(Document({"schema_version": WORD_SCHEMA_VERSION}, doc_id=1))
+
+    def _save_paragraphs(self, paragraphs: List[Dict]):
+        """Save the paragraphs which have not been saved yet."""
+        self._sync_indexes()
+        new_paragraphs = {
+            p["id"]: p for p in paragraphs if p["id"] not in self._paragraphs
+        }
+        if not new_paragraphs:
+            return
+
+        table = self._db.table(PARAGRAPHS_TABLE_NAME)
+        doc_ids = table.insert_multiple(new_paragraphs.values())
+        for doc_id, paragraph in zip(doc_ids, new_paragraphs.values(), strict=True):
+            self._paragraphs[paragraph["id"]] = Document(paragraph, doc_id=doc_id)
+
+    def _save_progresses(self, data_by_word: Dict[str, Dict]):
+        """Save the progress data of words, existing data is replaced.
+
+        :param data_by_word: The progress data, keyed by word.
+        """
+        progresses = self._progresses
+        existing = {w: progresses[w].doc_id for w in data_by_word if w in progresses}
+        if existing:
+
+            def _update(doc):
+                doc.update(data_by_word[doc["word"]])
+
+            self._progress_db.update(_update, doc_ids=list(existing.values()))
+
+        new_data = {w: data for w, data in data_by_word.items() if w not in existing}
+        if new_data:
+            doc_ids = self._progress_db.insert_multiple(new_data.values())
+            existing.update(zip(new_data, doc_ids, strict=True))
+
+        for word, data in data_by_word.items():
+            progresses[word] = Document(data, doc_id=existing[word])
+
+    def _remove_progresses(self, words: Iterable[str]):
+        """Remove the progress data of words, so they are back to the initial state."""
+        progresses = self._progresses
+        doc_ids = [doc.doc_id for w in words if (doc := progresses.pop(w, None))]
+        if doc_ids:
+            self._progress_db.remove(doc_ids=doc_ids)
+
+    def _release_paragraphs(self, docs: Iterable[Document]):
+        """Release the paragraphs referenced by the given word documents, a paragraph
+        is removed when it's no longer referenced by any word.
+        """
+        doc_ids = []
+        for doc in docs:
+            pid = doc["ws"].get("paragraph_id")
+            if not pid:
+                continue
+            self._paragraph_refs[pid] -= 1
+            if self._paragraph_refs[pid] > 0:
+                continue
+
+            del self._paragraph_refs[pid]
+            if paragraph := self._paragraphs.pop(pid, None):
+                doc_ids.append(paragraph.doc_id)
+        if doc_ids:
+            self._db.table(PARAGRAPHS_TABLE_NAME).remove(doc_ids=doc_ids)
+
+    @synchronized
+    def pick_quiz_words(self, count: int) -> List[WordSample]:
+        """Pick some words for generating quiz.
+
+        :param count: How many words to pick
+        :return: A list of words
+        """
+        return pick_randomly(self._find_least_used(count, "ts_date_quiz"), count)
+
+    @synchronized
+    def pick_story_words(self, count: int = 6) -> List[WordSample]:
+        """Pick some words for writing story
+
+        :param count: How many words to pick
+        :return: A list of words
+        """
+        return pick_randomly(self._find_least_used(count, "ts_date_storied"), count)
+
+    def _find_least_used(self, count: int, date_field: str) -> List[WordDetailedObj]:
+        """Find the candidates for picking words, which were used least recently.
+
+        :param count: How many words to pick.
+        :param date_field: The field in progress which stores the last used time.
+        """
+        progresses = self._progresses
+
+        def _key(d):
+            wp = progresses.get(d["ws"]["word"])
+            return ((wp and wp.get(date_field)) or 0, d["ts_date_added"] or 0)
 
+        docs = heapq.nsmallest(get_picking_range(count), self._index.values(), key=_key)
+        # Only the selected documents are turned into objects
+        return [self._to_detailed_obj(d, progresses) for d in docs]
+
+    @synchronized
+    def update_quiz_words(self, words: List[WordSample]):
+        super().update_quiz_words(words)
+
+    @synchronized
+    def update_story_words(self, words: List[WordSample]):
+        super().update_story_words(words)
+
+    @synchronized
+    def update_progresses(self, progresses: List[WordProgress]):
+        """Update the progresses of many words, only the progress file is written.
+
+        :param progresses: The new progress objects, words not in the store are ignored.
+        """
+        data_by_word = {
+            wp.word: asdict(wp) for wp in progresses if wp.word in self._index
+        }
+        if data_by_word:
+            self._save_progresses(data_by_word)
+
+    @synchronized
     def list_latest(self, limit: Optional[int] = None) -> List[WordDetailedObj]:
         """List latest added words
 
         :param limit: How many words to list, if not given, list all.
         :return: A list of detailed word objects.
         """
-        results = sorted(self.all(), key=lambda obj: obj.ts_date_added)
+        entries = self._date_index
         if limit is not None:
-            return results[-limit:]
-        else:
-            return results
+            entries = entries[max(len(entries) - limit, 0) :]
+        return self._entries_to_objs(entries)
 
+    @synchronized
     def list_by_date_range(
         self, start_date: datetime.date, end_date: datetime.date
     ) -> List[WordDetailedObj]:
@@ -184,60 +603,78 @@ class WordStore:
         :param end_date: The end date to filter words.
         :return: A list of detailed word objects.
         """
-        results = []
-        for obj in self.list_latest():
-            dt = datetime.datetime.fromtimestamp(obj.ts_date_added).date()
-            if start_date <= dt <= end_date:
-                results.append(obj)
-        return results
+        start_ts, end_ts = get_date_range_ts(start_date, end_date)
+        entries = self._date_index
+        lo = bisect.bisect_left(entries, (start_ts,))
+        hi = bisect.bisect_left(entries, (end_ts,))
+        return self._entries_to_objs(entries[lo:hi])
 
+    @synchronized
     def filter(self, words: Set[str]) -> Set[str]:
         """Filter the given word list, return those exists in current db
 
         :param words: a list of lower cased word.
         """
-        return {word for word in words if self.exists(word)}
+        return words & self._index.keys()
 
+    @synchronized
     def add(self, word: WordSample, ts_date_added: Optional[float] = None):
         """Add a word to the vocabulary book
 
         :param ts_date_added: If given, use this value as date added instead.
         """
-        Word = Query()
-        return self._db.upsert(
-            {
-                "ws": asdict(word),
-                "wp": asdict(WordProgress(word=word.word)),
-                "ts_date_added": ts_date_added
-                if ts_date_added is not None
-                else time.time(),
-            },
-            Word.ws.word == word.word,
-        )
+        ws, paragraph = split_paragraph(asdict(word))
+        doc = {
+            "ws": ws,
+            "ts_date_added": ts_date_added if ts_date_added is not None else time.time(),
+        }
+        # The word and the paragraphs are saved with one write
+        with batch_writes(self._db):
+            existing = self._index.get(word.word)
+            compact_word_doc(doc, self._strings)
+            if paragraph:
+                self._save_paragraphs([paragraph])
+                self._paragraph_refs[paragraph["id"]] += 1
+
+            if existing:
+                doc_ids = self._db.update(doc, doc_ids=[existing.doc_id])
+                self._remove_date_entry(existing)
+                self._release_paragraphs([existing])
+                # The word is added as a new one, start over the progress
+                self._remove_progresses([word.word])
+            else:
+                doc_ids = [self._db.insert(doc)]
+            new_doc = Document(doc, doc_id=doc_ids[0])
+            self._index[word.word] = new_doc
+            bisect.insort(self._date_index, _to_date_index_entry(new_doc))
+        return doc_ids
 
+    @synchronized
     def count(self) -> int:
         """The count of all words in store"""
-        return len(self._db.all())
+        return len(self._index)
 
+    @synchronized
     def get(self, word: str) -> Optional[WordDetailedObj]:
         """Get a result by word string
 
         :return: None if no word can be found
         """
-        Word = Query()
-        objs = self._db.search(Word.ws.word == word)
-        if not objs:
+        doc = self._index.get(word)
+        if doc is None:
             return None
-
-        return self._to_detailed_obj(objs[0])
+        return self._to_detailed_obj(doc)
 
     def all(self) -> Iterable[WordDetailedObj]:
         """Return all words and progresses objects
 
         :return: Detailed word objects.
         """
-        for d in self._db.all():
-            yield self._to_detailed_obj(d)
+        # Take a snapshot, the index might be changed during the iteration
+        with self._lock:
+            docs, progresses = list(self._index.values()), self._progresses
+        for d in docs:
+            yield self._to_detailed_obj(d, progresses)
 
     def search(
         self, keyword: str, order_by: str = "date_added"
@@ -248,10 +685,12 @@ class WordStore:
         :param order_by: The order of the result.
         :return: A generator of detailed word objects.
         """
-        results = sorted(self.all(), key=lambda obj: obj.ts_date_added)
-        for obj in results:
-            if keyword.lower() in obj.ws.word.lower():
-                yield obj
+        keyword = keyword.lower()
+        with self._lock:
+            index, progresses = self._index, self._progresses
+            docs = [index[w] for _, _, w in self._date_index if keyword in w.lower()]
+        for d in docs:
+            yield self._to_detailed_obj(d, progresses)
 
     def remove(self, word: str) -> List[int]:
         """Remove a word
@@ -259,35 +698,184 @@ class WordStore:
         :param word: Lower cased word.
         :return: A list of removed doc ID
         """
-        Word = Query()
-        return self._db.remove(Word.ws.word == word)
+        return self.remove_many([word])
+
+    @synchronized
+    def remove_many(self, words: List[str]) -> List[int]:
+        """Remove many words, the word file and the progress file are both written
+        only once.
+
+        :param words: Lower cased words.
+        :return: A list of removed doc ID
+        """
+        with batch_writes(self._db):
+            index = self._index
+            docs = [doc for w in dict.fromkeys(words) if (doc := index.pop(w, None))]
+            if not docs:
+                return []
+
+            for doc in docs:
+                self._remove_date_entry(doc)
+            doc_ids = self._db.remove(doc_ids=[doc.doc_id for doc in docs])
+            self._release_paragraphs(docs)
+        self._remove_progresses(words)
+        return doc_ids
 
     def exists(self, word: str):
         """Check if a word exists in current db
 
         :param word: Lower cased word.
         """
-        Word = Query()
-        return bool(self._db.search(Word.ws.word == word))
-
-    @staticmethod
-    def _to_detailed_obj(d: Dict) -> WordDetailedObj:
-        """Turn raw JSON data into WordDetailedObj object."""
-        # Handle data <= 0.2.0 version
-        d["ws"].setdefault("word_normal", None)
-        # Handle data in legacy versions that doesn't have definitions
-        if "definitions" not in d["ws"]:
-            if legacy_def := d["ws"].get("word_meaning", ""):
-                d["ws"]["definitions"] = [legacy_def]
-            else:
-                d["ws"]["definitions"] = []
-
-        return cattrs.structure(
-            {"ws": d["ws"], "wp": d["wp"], "ts_date_added": d["ts_date_added"]},
-            WordDetailedObj,
+        return word in self._index
+
+    def _remove_date_entry(self, doc: Document):
+        """Remove the entry of the given document from the date index."""
+        entry = _to_date_index_entry(doc)
+        idx = bisect.bisect_left(self._date_index, entry)
+        if idx < len(self._date_index) and self._date_index[idx] == entry:
+            del self._date_index[idx]
+
+    def _entries_to_objs(self, entries: List[DateIndexEntry]) -> List[WordDetailedObj]:
+        index, progresses = self._index, self._progresses
+        return [self._to_detailed_obj(index[word], progresses) for _, _, word in entries]
+
+    def _to_detailed_obj(
+        self, d: Dict, progresses: Optional[Dict[str, Document]] = None
+    ) -> WordDetailedObj:
+        """Turn raw JSON data into WordDetailedObj object, the paragraph referenced
+        by the word and the progress are resolved.
+
+        :param progresses: The progress index, pass it when turning many documents.
+        """
+        if progresses is None:
+            progresses = self._progresses
+        ws = d["ws"]
+        if pid := ws.get("paragraph_id"):
+            paragraph = self._paragraphs.get(pid, EMPTY_PARAGRAPH)
+            ws = {
+                **ws,
+                "orig_text": paragraph["orig_text"],
+                "translated_text": paragraph["translated_text"],
+            }
+        wp = progresses.get(ws["word"]) or {"word": ws["word"]}
+        return converter.structure(
+            {"ws": ws, "wp": wp, "ts_date_added": d["ts_date_added"]}, WordDetailedObj
         )
 
 
+def compact_word_doc(doc: Dict, strings: Dict[str, str]):
+    """Make the strings in a word document which are equal to the others share one
+    copy in memory, such as the sentences of the words from the same sentence, and
+    the word string repeated in the normal form. The document is modified in place,
+    its value stays the same.
+
+    :param strings: The shared copies of the strings, keyed by themselves. Unlike
+        the interned strings, they are freed once the dict is dropped.
+    """
+    ws = doc["ws"]
+    for field in SHARED_WS_FIELDS:
+        if value := ws.get(field):
+            ws[field] = strings.setdefault(value, value)
+
+    word = ws["word"]
+    if ws.get("word_normal") == word:
+        ws["word_normal"] = word
+    # The progress is only in the documents of legacy versions
+    if (wp := doc.get("wp")) and wp.get("word") == word:
+        wp["word"] = word
+
+
+def get_progress_file_path(file_path: Path) -> Path:
+    """Get the path of the file which stores the progresses of the words in the given
+    file, e.g. "words.json" -> "words_json_progress.jsonl". The extension is a part of
+    the name, so the JSON and the JSON log files of the same words don't share it.
+    """
+    return file_path.with_name(f"{file_path.name.replace('.', '_')}_progress.jsonl")
+
+
+def split_paragraph(ws: Dict) -> Tuple[Dict, Optional[Dict]]:
+    """Split the paragraph out of the word sample's data, so that the words from the
+    same paragraph can share one copy of it. The paragraph is identified by the hash of
+    its content.
+
+    :param ws: The raw data of the word sample.
+    :return: A tuple of (data referencing the paragraph, paragraph). If the word has
+        no paragraph, the data is returned as it is and the paragraph is `None`.
+    """
+    if not ws.get("orig_text"):
+        return ws, None
+
+    ws = dict(ws)
+    orig_text, translated_text = ws.pop("orig_text"), ws.pop("translated_text", "")
+    pid = get_paragraph_id(orig_text, translated_text)
+    ws["paragraph_id"] = pid
+    return ws, {"id": pid, "orig_text": orig_text, "translated_text": translated_text}
+
+
+def get_paragraph_id(orig_text: str, translated_text: str) -> str:
+    """Get the ID of a paragraph, which is the hash of its content."""
+    content = json.dumps([orig_text, translated_text], ensure_ascii=False)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upgrade_word_doc(ws: Dict) -> Optional[Dict]:
+    """Upgrade the word sample data of a word document in legacy formats.
+
+    :param ws: The raw data of the word sample.
+    :return: The upgraded data, `None` if it's already in the latest format.
+    """
+    if "word_normal" in ws and "definitions" in ws:
+        return None
+
+    ws = dict(ws)
+    # Handle data <= 0.2.0 version
+    ws.setdefault("word_normal", None)
+    # Handle data in legacy versions that doesn't have definitions
+    if "definitions" not in ws:
+        if legacy_def := ws.get("word_meaning", ""):
+            ws["definitions"] = [legacy_def]
+        else:
+            ws["definitions"] = []
+    return ws
+
+
+def _to_date_index_entry(doc: Document) -> DateIndexEntry:
+    return (doc["ts_date_added"], doc.doc_id, doc["ws"]["word"])
+
+
+def get_date_range_ts(
+    start_date: datetime.date, end_date: datetime.date
+) -> Tuple[float, float]:
+    """Get the range of timestamps for the given dates in local time, both dates are
+    inclusive.
+
+    :return: A tuple of (start, end), the end is exclusive.
+    """
+    start_ts = datetime.datetime.combine(start_date, datetime.time.min).timestamp()
+    end_ts = datetime.datetime.combine(
+        end_date + datetime.timedelta(days=1), datetime.time.min
+    ).timestamp()
+    return start_ts, end_ts
+
+
+def get_picking_range(count: int) -> int:
+    """Get how many candidates should be prepared for picking `count` words, the
+    result is randomized by picking from a slightly lager range.
+    """
+    return math.ceil(1.5 * count)
+
+
+def pick_randomly(candidates: List[WordDetailedObj], count: int) -> List[WordSample]:
+    """Pick words from the candidates randomly.
+
+    :param candidates: The candidates, usually prepared by `get_picking_range`.
+    :param count: How many words to pick.
+    """
+    results = list(candidates)
+    random.shuffle(results)
+    return [obj.ws for obj in results][:count]
+
+
 @dataclass
 class InternalState:
     """The internal state of current tool
@@ -302,18 +890,32 @@ class InternalState:
     server_latest_version: Optional[str] = None
 
 
-class InternalStateStore:
+class BaseInternalStateStore:
+    """The base class of stores which store the internal state of the tool itself."""
+
+    name_default = "default"
+
+    def set_internal_state(self, state: InternalState):
+        """Update the internal state."""
+        raise NotImplementedError
+
+    def get_internal_state(self) -> InternalState:
+        """Get the internal state."""
+        raise NotImplementedError
+
+
+class InternalStateStore(BaseInternalStateStore):
     """Stores the internal state of the tool itself.
 
     :param file_path: The file path which stores data.
     """
 
-    name_default = "default"
-
     def __init__(self, file_path: Path):
         self.file_path = file_path
-        self._db = TinyDB(self.file_path)
+        self._db = open_db(self.file_path)
+        self._lock = threading.RLock()
 
+    @synchronized
     def set_internal_state(self, state: InternalState):
         """Update the internal state."""
         State = Query()
@@ -321,6 +923,7 @@ class InternalStateStore:
             cattrs.unstructure(state), State.name == self.name_default
         )
 
+    @synchronized
     def get_internal_state(self) -> InternalState:
         """Get the internal state."""
         State = Query()
@@ -330,31 +933,61 @@ class InternalStateStore:
         return cattrs.structure(objs[0], InternalState)
 
 
-class SystemSettingsStore:
-    """Stores the system settings of the tool itself.
+class BaseSystemSettingsStore:
+    """The base class of stores which store the system settings of the tool itself."""
+
+    name_default = "default"
+
+    def set_system_settings(self, settings: SystemSettings):
+        """Set the system settings."""
+        raise NotImplementedError
+
+    def get_system_settings(self) -> Optional[SystemSettings]:
+        """Get the system settings, the object might be cached and shared by callers,
+        make a copy before modifying it.
+        """
+        raise NotImplementedError
+
+
+class SystemSettingsStore(BaseSystemSettingsStore):
+    """Stores the system settings of the tool itself, the settings are cached until
+    they are saved again or the file has been modified by others.
 
     :param file_path: The file path which stores data.
     """
 
-    name_default = "default"
-
     def __init__(self, file_path: Path):
         self.file_path = file_path
-        self._db = TinyDB(self.file_path)
+        self._db = open_db(self.file_path)
+        self._cached: Optional[SystemSettings] = None
+        self._cached_generation = -1
+        self._lock = threading.RLock()
 
+    @synchronized
     def set_system_settings(self, settings: SystemSettings):
         """Set the system settings."""
         State = Query()
-        return self._db.upsert(
+        doc_ids = self._db.upsert(
             {
                 "name": self.name_default,
                 "system_settings": cattrs.unstructure(settings),
             },
             State.name == self.name_default,
         )
+        self._cached = settings
+        self._cached_generation = get_generation(self._db)
+        return doc_ids
 
+    @synchronized
     def get_system_settings(self) -> Optional[SystemSettings]:
         """Get the system settings."""
+        generation = get_generation(self._db)
+        if generation != self._cached_generation:
+            self._cached = self._load()
+            self._cached_generation = generation
+        return self._cached
+
+    def _load(self) -> Optional[SystemSettings]:
         State = Query()
         objs = self._db.search(State.name == self.name_default)
         if not objs:
@@ -376,25 +1009,142 @@ def initialized_db():
     config.DEFAULT_DB_PATH.mkdir(exist_ok=True)
 
 
-def get_mastered_word_store() -> MasteredWordStore:
-    if not _db_initialized:
-        initialized_db()
-    return MasteredWordStore(config.DEFAULT_DB_PATH / "mastered_word.json")
+StoreT = TypeVar("StoreT")
 
 
-def get_word_store() -> WordStore:
-    if not _db_initialized:
-        initialized_db()
-    return WordStore(config.DEFAULT_DB_PATH / "word.json")
+class StoreRegistry:
+    """Holds the long-lived store instances of current process, so the data files
+    don't have to be opened and parsed again on every call. The stores will detect
+    the modifications made by other processes by themselves.
+    """
 
+    def __init__(self):
+        self._stores: Dict[Tuple[Callable, Path], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, store_cls: Callable[..., StoreT], file_path: Path, **kwargs) -> StoreT:
+        """Get the store object, create it if it doesn't exist yet.
+
+        :param store_cls: The type of store.
+        :param file_path: The file path which stores data.
+        :param kwargs: Extra arguments for creating the store.
+        """
+        key = (store_cls, file_path)
+        with self._lock:
+            if key not in self._stores:
+                if not _db_initialized:
+                    initialized_db()
+                self._stores[key] = store_cls(file_path, **kwargs)
+            return self._stores[key]
 
-def get_internal_state_store() -> InternalStateStore:
-    if not _db_initialized:
-        initialized_db()
-    return InternalStateStore(config.DEFAULT_DB_PATH / "internal.json")
+    def close_all(self):
+        """Close all the stores."""
+        with self._lock:
+            for store in self._stores.values():
+                store._db.close()
+            self._stores.clear()
 
 
-def get_sys_settings_store() -> SystemSettingsStore:
-    if not _db_initialized:
-        initialized_db()
-    return SystemSettingsStore(config.DEFAULT_DB_PATH / "settings.json")
+store_registry = StoreRegistry()
+
+
+def get_mastered_word_store() -> BaseMasteredWordStore:
+    if config.DB_BACKEND == "sqlite":
+        from voc_builder.infras.store_sqlite import SQLiteMasteredWordStore
+
+        return _get_sqlite_store(SQLiteMasteredWordStore)
+    return _get_words_store(MasteredWordStore, "mastered_word")
+
+
+def get_word_store() -> BaseWordStore:
+    if config.DB_BACKEND == "sqlite":
+        from voc_builder.infras.store_sqlite import SQLiteWordStore
+
+        return _get_sqlite_store(SQLiteWordStore)
+    return _get_words_store(WordStore, "word")
+
+
+def get_internal_state_store() -> BaseInternalStateStore:
+    if config.DB_BACKEND == "sqlite":
+        from voc_builder.infras.store_sqlite import SQLiteInternalStateStore
+
+        return _get_sqlite_store(SQLiteInternalStateStore)
+    return store_registry.get(
+        InternalStateStore, config.DEFAULT_DB_PATH / "internal.json"
+    )
+
+
+def get_sys_settings_store() -> BaseSystemSettingsStore:
+    if config.DB_BACKEND == "sqlite":
+        from voc_builder.infras.store_sqlite import SQLiteSystemSettingsStore
+
+        return _get_sqlite_store(SQLiteSystemSettingsStore)
+    return store_registry.get(
+        SystemSettingsStore, config.DEFAULT_DB_PATH / "settings.json"
+    )
+
+
+def _get_words_store(store_cls: Callable[..., StoreT], name: str) -> StoreT:
+    """Get a store which holds words, the storage depends on the backend config. When
+    switching to the "jsonl" backend, the existing JSON file is imported first.
+
+    :param name: The name of the data file, without the extension.
+    """
+    if config.DB_BACKEND == "jsonl":
+        file_path = config.DEFAULT_DB_PATH / f"{name}.jsonl"
+        json_path = config.DEFAULT_DB_PATH / f"{name}.json"
+        _import_progress_file(json_path, file_path)
+        import_json_db(json_path, file_path)
+        return store_registry.get(store_cls, file_path, storage=JSONLogStorage)
+    return store_registry.get(store_cls, config.DEFAULT_DB_PATH / f"{name}.json")
+
+
+def _import_progress_file(json_path: Path, log_path: Path):
+    """Copy the progress file of the JSON words file for the JSON log file which is
+    about to be imported. It's copied before the words, because the existence of the
+    words file marks the import as done.
+    """
+    src_path = get_progress_file_path(json_path)
+    dst_path = get_progress_file_path(log_path)
+    if log_path.exists() or dst_path.exists() or not src_path.exists():
+        return
+
+    tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+    shutil.copyfile(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+
+
+def _get_sqlite_store(store_cls: Callable[..., StoreT]) -> StoreT:
+    """Get a store which uses the SQLite database."""
+    from voc_builder.infras.store_sqlite import SQLITE_DB_FILENAME
+
+    return store_registry.get(store_cls, config.DEFAULT_DB_PATH / SQLITE_DB_FILENAME)
+
+
+# The max number of threads for running the store operations from async code
+STORE_IO_MAX_WORKERS = 4
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_lock = threading.Lock()
+
+
+async def run_store_io(func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+    """Run a store operation in a bounded thread pool, this is the facade for using
+    the stores in async code, so the event loop won't be blocked by file I/O, such as
+    rewriting a large vocabulary book.
+
+    Usage: `await run_store_io(get_word_store().count)`
+
+    :param func: The function which performs the store operation.
+    """
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=STORE_IO_MAX_WORKERS, thread_name_prefix="store_io"
+                )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _io_executor, functools.partial(func, *args, **kwargs)
+    )
@@ -0,0 +1,547 @@
+"""Stores backed by SQLite, they are used when the "sqlite" database backend is
+configured. All the stores share one SQLite database file.
+"""
+
+import datetime
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import cattrs
+
+from voc_builder.builder.models import WordProgress, WordSample
+from voc_builder.infras.converter import converter
+from voc_builder.infras.store import (
+    BaseInternalStateStore,
+    BaseMasteredWordStore,
+    BaseSystemSettingsStore,
+    BaseWordStore,
+    InternalState,
+    WordDetailedObj,
+    get_date_range_ts,
+    get_picking_range,
+    pick_randomly,
+    split_paragraph,
+)
+from voc_builder.system.models import SystemSettings
+
+# The file name of the SQLite database
+SQLITE_DB_FILENAME = "aivoc.sqlite3"
+
+# The columns of the "words" table
+WORD_COLUMNS = (
+    "word, ws, ts_date_added, quiz_cnt, ts_date_quiz, storied_cnt, ts_date_storied, "
+    "paragraph_id"
+)
+
+# The statement for querying words, together with the paragraphs they reference
+SELECT_WORDS = (
+    f"SELECT {WORD_COLUMNS}, paragraphs.orig_text, paragraphs.translated_text "
+    "FROM words LEFT JOIN paragraphs ON paragraphs.id = words.paragraph_id"
+)
+
+# How many words are queried in one statement when filtering words
+FILTER_BATCH_SIZE = 500
+
+# The statements for upgrading the schema, the N-th group upgrades the database to
+# version N + 1. The version is saved in "PRAGMA user_version".
+SCHEMA_UPGRADES = [
+    [
+        """CREATE TABLE IF NOT EXISTS words (
+            word TEXT PRIMARY KEY,
+            ws TEXT NOT NULL,
+            ts_date_added REAL NOT NULL,
+            quiz_cnt INTEGER NOT NULL DEFAULT 0,
+            ts_date_quiz REAL,
+            storied_cnt INTEGER NOT NULL DEFAULT 0,
+            ts_date_storied REAL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_words_date_added ON words (ts_date_added)",
+        "CREATE INDEX IF NOT EXISTS idx_words_date_quiz "
+        "ON words (ts_date_quiz, ts_date_added)",
+        "CREATE INDEX IF NOT EXISTS idx_words_date_storied "
+        "ON words (ts_date_storied, ts_date_added)",
+        "CREATE TABLE IF NOT EXISTS mastered_words (word TEXT PRIMARY KEY)",
+        "CREATE TABLE IF NOT EXISTS internal_states "
+        "(name TEXT PRIMARY KEY, data TEXT NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS system_settings "
+        "(name TEXT PRIMARY KEY, data TEXT NOT NULL)",
+    ],
+    # The paragraphs are stored once and referenced by words
+    [
+        """CREATE TABLE paragraphs (
+            id TEXT PRIMARY KEY,
+            orig_text TEXT NOT NULL,
+            translated_text TEXT NOT NULL
+        )""",
+        "ALTER TABLE words ADD COLUMN paragraph_id TEXT",
+        "CREATE INDEX idx_words_paragraph ON words (paragraph_id)",
+    ],
+]
+
+
+class SQLiteDB:
+    """A connection to the SQLite database, it can be shared by threads.
+
+    :param file_path: The path of the database file.
+    """
+
+    # How long to wait for the lock held by other processes, in seconds
+    busy_timeout = 10
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            file_path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            # The WAL mode allows the readers and the writer to work at the same time
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._upgrade_schema()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Start a transaction, it's committed when the block exits without errors."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        """Run a query and fetch all the rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def data_version(self) -> int:
+        """Get the data version of the database, it changes when the database has been
+        modified by other connections.
+        """
+        return self.query("PRAGMA data_version")[0][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _upgrade_schema(self):
+        """Upgrade the schema to the latest version, the database might be upgraded by
+        other processes at the same time, so the version is checked in the transaction.
+        """
+        if self._get_version() >= len(SCHEMA_UPGRADES):
+            return
+
+        with self.transaction() as conn:
+            version = self._get_version()
+            for statements in SCHEMA_UPGRADES[version:]:
+                for sql in statements:
+                    conn.execute(sql)
+            if version < 2:
+                move_paragraphs(conn)
+            # PRAGMA statements can't be parameterized
+            conn.execute(f"PRAGMA user_version = {len(SCHEMA_UPGRADES)}")
+
+    def _get_version(self) -> int:
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+class SQLiteMasteredWordStore(BaseMasteredWordStore):
+    """Stores words the user has already mastered
+
+    :param file_path: The path of the database file.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._db = SQLiteDB(file_path)
+
+    def filter(self, words: Set[str]) -> Set[str]:
+        return filter_existing(self._db, "mastered_words", words)
+
+    def all(self) -> List[str]:
+        return [row["word"] for row in self._db.query("SELECT word FROM mastered_words")]
+
+    def add(self, word: str):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO mastered_words (word) VALUES (?)", (word,)
+            )
+
+    def add_many(self, words: List[str]):
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO mastered_words (word) VALUES (?)",
+                [(w,) for w in words],
+            )
+
+    def remove(self, word: str):
+        with self._db.transaction() as conn:
+            conn.execute("DELETE FROM mastered_words WHERE word = ?", (word,))
+
+    def remove_many(self, words: List[str]):
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM mastered_words WHERE word = ?", [(w,) for w in words]
+            )
+
+    def exists(self, word: str) -> bool:
+        rows = self._db.query("SELECT 1 FROM mastered_words WHERE word = ?", (word,))
+        return bool(rows)
+
+
+class SQLiteWordStore(BaseWordStore):
+    """Stores all the words in vocabulary book, the learning progress of every word is
+    stored in indexed columns.
+
+    :param file_path: The path of the database file.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._db = SQLiteDB(file_path)
+
+    def pick_quiz_words(self, count: int) -> List[WordSample]:
+        rows = self._db.query(
+            f"{SELECT_WORDS} ORDER BY ts_date_quiz, ts_date_added LIMIT ?",
+            (get_picking_range(count),),
+        )
+        return pick_randomly([row_to_detailed_obj(row) for row in rows], count)
+
+    def pick_story_words(self, count: int = 6) -> List[WordSample]:
+        rows = self._db.query(
+            f"{SELECT_WORDS} ORDER BY ts_date_storied, ts_date_added LIMIT ?",
+            (get_picking_range(count),),
+        )
+        return pick_randomly([row_to_detailed_obj(row) for row in rows], count)
+
+    def update_progresses(self, progresses: List[WordProgress]):
+        with self._db.transaction() as conn:
+            conn.executemany(
+                "UPDATE words SET quiz_cnt = ?, ts_date_quiz = ?, storied_cnt = ?, "
+                "ts_date_storied = ? WHERE word = ?",
+                [
+                    (
+                        wp.quiz_cnt,
+                        wp.ts_date_quiz,
+                        wp.storied_cnt,
+                        wp.ts_date_storied,
+                        wp.word,
+                    )
+                    for wp in progresses
+                ],
+            )
+
+    def list_latest(self, limit: Optional[int] = None) -> List[WordDetailedObj]:
+        if limit is None:
+            rows = self._db.query(f"{SELECT_WORDS} ORDER BY ts_date_added")
+        else:
+            rows = self._db.query(
+                f"{SELECT_WORDS} ORDER BY ts_date_added DESC LIMIT ?",
+                (limit,),
+            )[::-1]
+        return [row_to_detailed_obj(row) for row in rows]
+
+    def list_by_date_range(
+        self, start_date: datetime.date, end_date: datetime.date
+    ) -> List[WordDetailedObj]:
+        start_ts, end_ts = get_date_range_ts(start_date, end_date)
+        rows = self._db.query(
+            f"{SELECT_WORDS} WHERE ts_date_added >= ? AND ts_date_added < ? "
+            "ORDER BY ts_date_added",
+            (start_ts, end_ts),
+        )
+        return [row_to_detailed_obj(row) for row in rows]
+
+    def filter(self, words: Set[str]) -> Set[str]:
+        return filter_existing(self._db, "words", words)
+
+    def add(self, word: WordSample, ts_date_added: Optional[float] = None):
+        ts = ts_date_added if ts_date_added is not None else time.time()
+        ws, paragraph = split_paragraph(asdict(word))
+        with self._db.transaction() as conn:
+            old_pids = get_paragraph_ids(conn, [word.word])
+            if paragraph:
+                save_paragraphs(conn, [paragraph])
+            conn.execute(
+                "INSERT OR REPLACE INTO words (word, ws, ts_date_added, paragraph_id) "
+                "VALUES (?, ?, ?, ?)",
+                (word.word, json.dumps(ws), ts, ws.get("paragraph_id")),
+            )
+            release_paragraphs(conn, old_pids)
+
+    def count(self) -> int:
+        return self._db.query("SELECT COUNT(*) FROM words")[0][0]
+
+    def get(self, word: str) -> Optional[WordDetailedObj]:
+        rows = self._db.query(f"{SELECT_WORDS} WHERE word = ?", (word,))
+        if not rows:
+            return None
+        return row_to_detailed_obj(rows[0])
+
+    def all(self) -> Iterable[WordDetailedObj]:
+        for row in self._db.query(SELECT_WORDS):
+            yield row_to_detailed_obj(row)
+
+    def search(
+        self, keyword: str, order_by: str = "date_added"
+    ) -> Iterable[WordDetailedObj]:
+        rows = self._db.query(
+            f"{SELECT_WORDS} WHERE instr(lower(word), lower(?)) > 0 "
+            "ORDER BY ts_date_added",
+            (keyword,),
+        )
+        for row in rows:
+            yield row_to_detailed_obj(row)
+
+    def remove(self, word: str):
+        self.remove_many([word])
+
+    def remove_many(self, words: List[str]):
+        with self._db.transaction() as conn:
+            pids = get_paragraph_ids(conn, words)
+            conn.executemany("DELETE FROM words WHERE word = ?", [(w,) for w in words])
+            release_paragraphs(conn, pids)
+
+    def exists(self, word: str) -> bool:
+        return bool(self._db.query("SELECT 1 FROM words WHERE word = ?", (word,)))
+
+
+class SQLiteInternalStateStore(BaseInternalStateStore):
+    """Stores the internal state of the tool itself.
+
+    :param file_path: The path of the database file.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._db = SQLiteDB(file_path)
+
+    def set_internal_state(self, state: InternalState):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO internal_states (name, data) VALUES (?, ?)",
+                (self.name_default, json.dumps(cattrs.unstructure(state))),
+            )
+
+    def get_internal_state(self) -> InternalState:
+        rows = self._db.query(
+            "SELECT data FROM internal_states WHERE name = ?", (self.name_default,)
+        )
+        if not rows:
+            return InternalState(name=self.name_default, last_ver_checking_ts=-1)
+        return cattrs.structure(json.loads(rows[0]["data"]), InternalState)
+
+
+class SQLiteSystemSettingsStore(BaseSystemSettingsStore):
+    """Stores the system settings of the tool itself.
+
+    :param file_path: The path of the database file.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self._db = SQLiteDB(file_path)
+        # The settings are cached until the database has been modified by others
+        self._cached: Optional[SystemSettings] = None
+        self._cached_version = -1
+
+    def set_system_settings(self, settings: SystemSettings):
+        with self._db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO system_settings (name, data) VALUES (?, ?)",
+                (self.name_default, json.dumps(cattrs.unstructure(settings))),
+            )
+        self._cached = settings
+        self._cached_version = self._db.data_version()
+
+    def get_system_settings(self) -> Optional[SystemSettings]:
+        version = self._db.data_version()
+        if version != self._cached_version:
+            self._cached = self._load()
+            self._cached_version = version
+        return self._cached
+
+    def _load(self) -> Optional[SystemSettings]:
+        rows = self._db.query(
+            "SELECT data FROM system_settings WHERE name = ?", (self.name_default,)
+        )
+        if not rows:
+            return None
+        return cattrs.structure(json.loads(rows[0]["data"]), SystemSettings)
+
+
+def filter_existing(db: SQLiteDB, table: str, words: Set[str]) -> Set[str]:
+    """Filter the given words, return those exists in the "word" column of the table."""
+    results: Set[str] = set()
+    words_list = list(words)
+    # Query in batches, the number of parameters in one statement is limited
+    for i in range(0, len(words_list), FILTER_BATCH_SIZE):
+        batch = words_list[i : i + FILTER_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        rows = db.query(
+            f"SELECT word FROM {table} WHERE word IN ({placeholders})", batch
+        )
+        results.update(row["word"] for row in rows)
+    return results
+
+
+def get_paragraph_ids(conn: sqlite3.Connection, words: List[str]) -> Set[str]:
+    """Get the IDs of the paragraphs referenced by the given words."""
+    results: Set[str] = set()
+    for i in range(0, len(words), FILTER_BATCH_SIZE):
+        batch = words[i : i + FILTER_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        rows = conn.execute(
+            f"SELECT paragraph_id FROM words WHERE word IN ({placeholders}) "
+            "AND paragraph_id IS NOT NULL",
+            batch,
+        ).fetchall()
+        results.update(row[0] for row in rows)
+    return results
+
+
+def save_paragraphs(conn: sqlite3.Connection, paragraphs: List[Dict[str, str]]):
+    """Save the paragraphs, those already saved are skipped."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO paragraphs (id, orig_text, translated_text) "
+        "VALUES (:id, :orig_text, :translated_text)",
+        paragraphs,
+    )
+
+
+def release_paragraphs(conn: sqlite3.Connection, pids: Iterable[str]):
+    """Remove the given paragraphs if they are no longer referenced by any word."""
+    conn.executemany(
+        "DELETE FROM paragraphs WHERE id = ? "
+        "AND NOT EXISTS (SELECT 1 FROM words WHERE paragraph_id = ?)",
+        [(pid, pid) for pid in pids],
+    )
+
+
+def move_paragraphs(conn: sqlite3.Connection):
+    """Move the paragraphs stored in the words into the "paragraphs" table."""
+    updates = []
+    paragraphs = []
+    for row in conn.execute("SELECT word, ws FROM words").fetchall():
+        ws, paragraph = split_paragraph(json.loads(row["ws"]))
+        if paragraph:
+            paragraphs.append(paragraph)
+            updates.append((json.dumps(ws), paragraph["id"], row["word"]))
+    save_paragraphs(conn, paragraphs)
+    conn.executemany("UPDATE words SET ws = ?, paragraph_id = ? WHERE word = ?", updates)
+
+
+def row_to_detailed_obj(row: sqlite3.Row) -> WordDetailedObj:
+    """Turn a row of the "words" table into WordDetailedObj object, the columns of the
+    referenced paragraph should be included.
+    """
+    data = json.loads(row["ws"])
+    if row["paragraph_id"]:
+        data["orig_text"] = row["orig_text"] or ""
+        data["translated_text"] = row["translated_text"] or ""
+    ws = converter.structure(data, WordSample)
+    wp = WordProgress(
+        word=row["word"],
+        quiz_cnt=row["quiz_cnt"],
+        ts_date_quiz=row["ts_date_quiz"],
+        storied_cnt=row["storied_cnt"],
+        ts_date_storied=row["ts_date_storied"],
+    )
+    return WordDetailedObj(ws=ws, wp=wp, ts_date_added=row["ts_date_added"])
+
+
+def detailed_obj_to_row(
+    obj: WordDetailedObj,
+) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+    """Turn a WordDetailedObj object into a row of the "words" table.
+
+    :return: A tuple of (row, the paragraph referenced by the row).
+    """
+    ws, paragraph = split_paragraph(asdict(obj.ws))
+    row = {
+        "word": obj.ws.word,
+        "ws": json.dumps(ws),
+        "ts_date_added": obj.ts_date_added,
+        "quiz_cnt": obj.wp.quiz_cnt,
+        "ts_date_quiz": obj.wp.ts_date_quiz,
+        "storied_cnt": obj.wp.storied_cnt,
+        "ts_date_storied": obj.wp.ts_date_storied,
+        "paragraph_id": ws.get("paragraph_id"),
+    }
+    return row, paragraph
+
+
+def migrate_from_tinydb(
+    db_path: Path,
+    word_store: BaseWordStore,
+    mastered_word_store: BaseMasteredWordStore,
+    state_store: BaseInternalStateStore,
+    settings_store: BaseSystemSettingsStore,
+) -> Dict[str, int]:
+    """Load all the data in the given stores into the SQLite database, the data is
+    loaded in one transaction, existing records will be replaced.
+
+    :param db_path: The path of the SQLite database file.
+    :return: The count of records loaded, by the type of data.
+    """
+    words = []
+    paragraphs = []
+    for obj in word_store.all():
+        row, paragraph = detailed_obj_to_row(obj)
+        words.append(row)
+        if paragraph:
+            paragraphs.append(paragraph)
+    mastered_words = mastered_word_store.all()
+    state = state_store.get_internal_state()
+    settings = settings_store.get_system_settings()
+
+    db = SQLiteDB(db_path)
+    try:
+        with db.transaction() as conn:
+            save_paragraphs(conn, paragraphs)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO words ({WORD_COLUMNS}) VALUES "
+                "(:word, :ws, :ts_date_added, :quiz_cnt, :ts_date_quiz, :storied_cnt, "
+                ":ts_date_storied, :paragraph_id)",
+                words,
+            )
+            # Remove the paragraphs of the replaced words
+            conn.execute(
+                "DELETE FROM paragraphs WHERE id NOT IN "
+                "(SELECT paragraph_id FROM words WHERE paragraph_id IS NOT NULL)"
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO mastered_words (word) VALUES (?)",
+                [(w,) for w in mastered_words],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO internal_states (name, data) VALUES (?, ?)",
+                (state_store.name_default, json.dumps(cattrs.unstructure(state))),
+            )
+            if settings:
+                conn.execute(
+                    "INSERT OR REPLACE INTO system_settings (name, data) VALUES (?, ?)",
+                    (
+                        settings_store.name_default,
+                        json.dumps(cattrs.unstructure(settings)),
+                    ),
+                )
+    finally:
+        db.close()
+    return {
+        "words": len(words),
+        "mastered_words": len(mastered_words),
+        "system_settings": int(settings is not None),
+    }
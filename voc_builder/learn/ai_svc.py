@@ -1,25 +1,27 @@
 import logging
 from typing import AsyncGenerator, List
 
-from pydantic_ai import Agent
-
 from voc_builder.builder.models import WordSample
 from voc_builder.exceptions import AIServiceError
+from voc_builder.infras.ai import get_agent
 
 logger = logging.getLogger()
 
 
-async def get_story(model, words: List[WordSample]) -> AsyncGenerator[str, None]:
+async def get_story(
+    model, words: List[WordSample], delta: bool = False
+) -> AsyncGenerator[str, None]:
     """Query AI backend API to get a story.
 
     :param live_info: The info object which represents the writing procedure
+    :param delta: Whether to yield only the new text instead of the full text so far.
     :return: The story text
     :raise: AIServiceError
     """
     # Try to use the normal form of each word
     str_words = [w.word_normal or w.word for w in words]
     try:
-        async for message in query_story(model, str_words):
+        async for message in query_story(model, str_words, delta):
             yield message
     except Exception as e:
         raise AIServiceError("Error calling AI backend API: %s" % e)
@@ -39,7 +41,9 @@ exciting enough to keep the reader’s attention while helping them learn new wo
 """  # noqa: E501
 
 
-async def query_story(model, words: List[str]) -> AsyncGenerator[str, None]:
+async def query_story(
+    model, words: List[str], delta: bool = False
+) -> AsyncGenerator[str, None]:
     """Query AI backend API to get a story.
 
     :param stream_handler: A callback function to handle partial replies.
@@ -49,7 +53,7 @@ async def query_story(model, words: List[str]) -> AsyncGenerator[str, None]:
     prompt = prompt_write_story_user_tmpl.format(
         words=words_str, total_words_cnt=len(words) * 30
     )
-    agent: Agent = Agent(model)
+    agent = get_agent(model)
     async with agent.run_stream(prompt) as result:
-        async for message in result.stream():
+        async for message in result.stream_text(delta=delta):
             yield message
@@ -11,9 +11,19 @@ from typing_extensions import Annotated
 from voc_builder.builder.models import WordSample
 from voc_builder.builder.serializers import WordSampleOutput
 from voc_builder.common.errors import error_codes
+from voc_builder.common.web.sse import (
+    StreamMode,
+    coalesce_text,
+    make_checksum_event,
+)
 from voc_builder.exceptions import AIServiceError
+from voc_builder.infras import config
 from voc_builder.infras.ai import create_ai_model_config
-from voc_builder.infras.store import get_mastered_word_store, get_word_store
+from voc_builder.infras.store import (
+    get_mastered_word_store,
+    get_word_store,
+    run_store_io,
+)
 from voc_builder.misc.export import AnkiDeckWriter, VocCSVWriter
 
 from .ai_svc import get_story
@@ -32,28 +42,53 @@ def get_words_for_quiz(words_num: Annotated[Literal["5", "10", "25", "50"], Quer
 
 
 @router.get("/api/stories/")
-def create_new_story(words_num: Annotated[Literal["6", "12", "24"], Query(...)]):
+def create_new_story(
+    words_num: Annotated[Literal["6", "12", "24"], Query(...)],
+    stream_mode: StreamMode = StreamMode.FULL,
+):
     """Create a new story."""
     word_store = get_word_store()
     words = word_store.pick_story_words(int(words_num))
     word_store.update_story_words(words)
-    return EventSourceResponse(gen_story_sse(words))
+    return EventSourceResponse(gen_story_sse(words, stream_mode))
 
 
-async def gen_story_sse(words: List[WordSample]) -> AsyncGenerator[Dict, None]:
-    """Generate the SSE events for the story writing progress."""
+async def gen_story_sse(
+    words: List[WordSample], stream_mode: StreamMode = StreamMode.FULL
+) -> AsyncGenerator[Dict, None]:
+    """Generate the SSE events for the story writing progress.
+
+    :param stream_mode: In delta mode, the "story_delta" events which contain only the
+        new text are sent instead of the "story_partial" events.
+    """
     out_words = [WordSampleOutput.from_db_obj(w) for w in words]
     yield {
         "event": "words",
         "data": json.dumps([w.model_dump(mode="json") for w in out_words]),
     }
 
+    delta = stream_mode == StreamMode.DELTA
+    pieces: List[str] = []
     try:
-        model_config = create_ai_model_config()
-        async for text in get_story(model_config.model, words):
-            yield {"event": "story_partial", "data": text}
+        model_config = await run_store_io(create_ai_model_config)
+        async for piece in coalesce_text(
+            get_story(model_config.model, words, delta),
+            delta,
+            config.SSE_FLUSH_INTERVAL,
+            config.SSE_MIN_CHUNK_SIZE,
+        ):
+            if delta:
+                pieces.append(piece)
+                yield {"event": "story_delta", "data": piece}
+            else:
+                pieces = [piece]
+                yield {"event": "story_partial", "data": piece}
     except AIServiceError as e:
         yield {"event": "error", "data": json.dumps({"message": str(e)})}
+
+    text = "".join(pieces)
+    if delta:
+        yield make_checksum_event(text)
     yield {"event": "story", "data": text}
 
 
@@ -109,6 +144,5 @@ def get_mastered_words():
 def delete_mastered_words(req: DeleteMasteredWordsInput, response: Response):
     """Delete words from the mastered words."""
     mastered_word_s = get_mastered_word_store()
-    for word in req.words:
-        mastered_word_s.remove(word)
+    mastered_word_s.remove_many(req.words)
     response.status_code = status.HTTP_204_NO_CONTENT
@@ -12,6 +12,7 @@ import uvicorn
 from rich.console import Console
 
 from voc_builder import __version__
+from voc_builder.commands.db import handle_migrate
 from voc_builder.commands.export import FormatType, handle_export
 
 # Set logging to stdout by default
@@ -57,6 +58,22 @@ def export(format: str, file_path: Optional[str]):
     handle_export(format, file_path)
 
 
+@main.group(help="Manage the databases")
+def db():
+    pass
+
+
+@db.command(help="Migrate the data in JSON files into the SQLite database")
+@click.option(
+    "--source",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    help="The backend of the existing data, supported value: json, jsonl.",
+)
+def migrate(source: str):
+    handle_migrate(source)
+
+
 @main.command(help="Start the notebook server")
 @click.option(
     "--log-level",
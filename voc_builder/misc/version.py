@@ -1,5 +1,6 @@
 """Many functions of this module are copied from https://github.com/wimglenn/johnnydep"""
 
+import asyncio
 import logging
 import time
 from pathlib import Path
@@ -23,40 +24,54 @@ PACKAGE_NAME = "ai-vocabulary-builder"
 
 # Perform version checking only after 8 hours have passed since the last action.
 VERSION_CHECKING_INTERVAL = 3600 * 8
+# How often the version checker wakes up, the checking might have been performed by
+# other processes in the meantime.
+VERSION_CHECKER_POLL_INTERVAL = 3600
 
 
 def get_new_version() -> Optional[str]:
-    """Check if there's a new versions available."""
-    current = __version__
+    """Get the new version available, the result is read from the internal state
+    which is updated by the version checker, no network requests are made.
+    """
+    state = get_internal_state_store().get_internal_state()
+    latest = state.server_latest_version
+    if latest and version.parse(__version__) < version.parse(latest):
+        return latest
+    return None
+
+
+def check_latest_version():
+    """Check the latest version on the package index and save it to the internal
+    state, the checking is skipped if it has been performed recently.
+    """
     state_store = get_internal_state_store()
     state = state_store.get_internal_state()
     if time.time() - state.last_ver_checking_ts < VERSION_CHECKING_INTERVAL:
-        latest = state.server_latest_version
-        if not latest:
-            return None
-        if version.parse(current) < version.parse(latest):
-            return latest
-        return None
+        return
 
+    # Always set last version checking time, even if the checking fails
     state.last_ver_checking_ts = time.time()
     state_store.set_internal_state(state)
 
-    try:
-        latest = JohnnyDist(
-            PACKAGE_NAME, index_urls=(DEFAULT_INDEX,)
-        ).versions_available()[-1]
-    finally:
-        # Alway set last version checking time
-        state_store.set_internal_state(state)
+    latest = JohnnyDist(PACKAGE_NAME, index_urls=(DEFAULT_INDEX,)).versions_available()[
+        -1
+    ]
 
     # Save the latest version to the state
     state.server_latest_version = latest
     state_store.set_internal_state(state)
 
-    assert latest
-    if version.parse(current) < version.parse(latest):
-        return latest
-    return None
+
+async def run_version_checker():
+    """Check the latest version periodically, should be run as a background task.
+    The checking makes blocking network requests, so it is run in a thread.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(check_latest_version)
+        except Exception:
+            logger.exception("Error checking new version.")
+        await asyncio.sleep(VERSION_CHECKER_POLL_INTERVAL)
 
 
 class JohnnyDist:
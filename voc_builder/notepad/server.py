@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import pathlib
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
@@ -9,7 +11,9 @@ from pydantic import ValidationError
 from starlette.responses import FileResponse
 
 from voc_builder.builder.views import router as builder_router
+from voc_builder.infras.ai import close_http_client
 from voc_builder.learn.views import router as learn_router
+from voc_builder.misc.version import run_version_checker
 from voc_builder.system.views import router as system_router
 
 from ..common.errors import (
@@ -23,7 +27,16 @@ logger = logging.getLogger(__name__)
 
 ROOT_DIR = pathlib.Path(__file__).parent.resolve()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    version_checker = asyncio.create_task(run_version_checker())
+    yield
+    version_checker.cancel()
+    await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_exception_handler(ValidationError, pydantic_exception_handler)  # type: ignore
 app.add_exception_handler(RequestValidationError, req_validation_exception_handler)  # type: ignore
@@ -1,3 +1,4 @@
+import copy
 import logging
 
 import cattrs
@@ -5,7 +6,12 @@ from fastapi import APIRouter, Response
 from fastapi.responses import JSONResponse
 
 import voc_builder
-from voc_builder.infras.store import get_sys_settings_store, get_word_store
+from voc_builder.builder.ai_svc import get_translation_memory, get_word_def_cache
+from voc_builder.infras.store import (
+    get_sys_settings_store,
+    get_word_store,
+    run_store_io,
+)
 from voc_builder.misc.version import get_new_version
 from voc_builder.system.constants import ModelProvider, TargetLanguage
 from voc_builder.system.language import get_target_language
@@ -42,18 +48,21 @@ MIN_WORDS_QUIZ = 5
 @router.get("/api/system_status")
 async def get_system_status(response: Response):
     """Get the system status."""
-    settings = get_sys_settings_store().get_system_settings()
+    settings = await run_store_io(get_sys_settings_store().get_system_settings)
     model_settings_initialized = bool(settings and settings.model_provider)
+    # The version is checked by a background task, only read the result here
     try:
-        new_version = get_new_version()
+        new_version = await run_store_io(get_new_version)
     except Exception:
         logger.exception("Error checking new version.")
         new_version = None
-    words_cnt = get_word_store().count()
+    # The store is created on the first use, which reads the whole file
+    words_cnt = await run_store_io(lambda: get_word_store().count())
+    target_language = await run_store_io(get_target_language)
     return JSONResponse(
         {
             "version": voc_builder.__version__,
-            "target_language": get_target_language(),
+            "target_language": target_language,
             "model_settings_initialized": model_settings_initialized,
             "new_version": new_version,
             "words_cnt": words_cnt,
@@ -63,10 +72,21 @@ async def get_system_status(response: Response):
     )
 
 
+@router.get("/api/cache_stats")
+def get_cache_stats():
+    """Get the statistics of the caches, the hits and misses are counted in the
+    current process only.
+    """
+    return {
+        "word_def_cache": get_word_def_cache().stats(),
+        "translation_memory": get_translation_memory().stats(),
+    }
+
+
 @router.get("/api/settings")
 async def get_settings(response: Response):
     """Get the system settings."""
-    settings = get_sys_settings_store().get_system_settings()
+    settings = await run_store_io(get_sys_settings_store().get_system_settings)
     if not settings:
         settings = build_default_settings()
     return JSONResponse(
@@ -99,9 +119,9 @@ def get_model_options(input_data: ModelOptionsInput):
 async def save_settings(settings_input: SettingsInput, response: Response):
     """Save the system settings."""
     settings_store = get_sys_settings_store()
-    settings = settings_store.get_system_settings()
-    if not settings:
-        settings = build_default_settings()
+    settings = await run_store_io(settings_store.get_system_settings)
+    # The settings object is shared, modify a copy of it
+    settings = copy.deepcopy(settings) if settings else build_default_settings()
 
     settings.target_language = settings_input.target_language
     settings.model_provider = settings_input.model_provider
@@ -120,5 +140,5 @@ async def save_settings(settings_input: SettingsInput, response: Response):
         d_obj = DeepSeekConfigInput(**settings_input.deepseek_config)
         settings.deepseek_config = DeepSeekConfig(**d_obj.model_dump(mode="json"))
 
-    settings_store.set_system_settings(settings)
+    await run_store_io(settings_store.set_system_settings, settings)
     return {}